@@ -0,0 +1,393 @@
+"""
+DISCLAIMER: This file was created for the thesis of Romana Wilschut for the
+            bachelor ‘Artificial Intelligence’ at the University of Amsterdam.
+NAME:       Romana Wilschut
+UVA ID:     12156884
+INFO:       This file consists of the compiled delegation ballots of a smart
+            profile. Every cell of a profile is parsed once into a direct vote,
+            a single delegation, a quota rule or a formula of propositional logic,
+            which can be evaluated for a partial vote vector. A ballot can also
+            be tracked incrementally, so fixing a vote only updates the counts
+            of the ballots that mention the agent.
+"""
+
+import re
+
+D = ('0', '1')
+
+OPERATORS = ('&', '|', '~', '(', ')')
+# Operators and agent names of a formula, and a quota rule that is the whole cell
+TOKENS = re.compile(r"[&|~()]|[^\s&|~()]+")
+QUOTA = re.compile(r"quota\(([^(),]*),\s*(-?\d+)\s*\)")
+
+
+class DirectVote:
+    """
+    Direct vote '0' or '1' of an agent.
+    """
+    __slots__ = ('value', 'agents')
+    direct = True
+
+    def __init__(self, value):
+        self.value = value
+        self.agents = ()
+
+    def evaluate(self, Y):
+        return True, self.value
+
+    def tracker(self):
+        return self
+
+    def result(self):
+        return True, self.value
+
+
+class Delegate:
+    """
+    Delegation of the vote to a single other agent.
+    """
+    __slots__ = ('agent', 'agents')
+    direct = False
+
+    def __init__(self, agent):
+        self.agent = agent
+        self.agents = (agent,)
+
+    def evaluate(self, Y):
+        vote = Y[self.agent]
+        if vote in D:
+            return True, vote
+        return False, ''
+
+    def tracker(self):
+        # A single delegation has no state, it is calculable once its agent votes
+        return self
+
+    def result(self):
+        return False, ''
+
+    def assign(self, agent, vote):
+        return True, vote
+
+    def evaluate_issues(self, known, ones, issues):
+        return known[self.agent], ones[self.agent]
+
+
+class QuotaRule:
+    """
+    Quota rule: the outcome is '1' when at least quota participants vote '1'.
+    """
+    __slots__ = ('agents', 'quota', 'weight')
+    direct = False
+
+    def __init__(self, participants, quota):
+        self.agents = tuple(participants)
+        self.quota = quota
+
+        # Number of times every agent participates
+        self.weight = {}
+        for participant in self.agents:
+            self.weight[participant] = self.weight.get(participant, 0) + 1
+
+    def evaluate(self, Y):
+        ones, zeros = 0, 0
+        for participant in self.agents:
+            vote = Y[participant]
+            if vote == '1':
+                ones += 1
+            elif vote == '0':
+                zeros += 1
+
+        # Check if the vote can be calculated with the current known votes
+        if ones >= self.quota:
+            return True, '1'
+        elif zeros > len(self.agents) - self.quota:
+            return True, '0'
+
+        return False, ''
+
+    def tracker(self):
+        return QuotaTracker(self)
+
+    def evaluate_issues(self, known, ones, issues):
+        # The votes '1' and '0' of all issues are counted at once in bit-sliced counters
+        one_counter, zero_counter = [], []
+        for participant in self.agents:
+            add_bits(one_counter, ones[participant])
+            add_bits(zero_counter, known[participant] & ~ones[participant])
+
+        outcome = at_least(one_counter, self.quota, issues)
+        zeros = at_least(zero_counter, len(self.agents) - self.quota + 1, issues) & ~outcome
+
+        return outcome | zeros, outcome
+
+
+class Formula:
+    """
+    Formula of propositional logic in disjunctive normal form, stored as a tuple
+    of conjunctions of (agent, negated) literals.
+    """
+    __slots__ = ('conjunctions', 'agents', 'occurrences')
+    direct = False
+
+    def __init__(self, conjunctions):
+        self.conjunctions = tuple(tuple(conjunction) for conjunction in conjunctions)
+        self.agents = tuple(sorted({agent for conjunction in self.conjunctions for agent, _ in conjunction}))
+
+        # For every agent the (conjunction, negated) literals in which it occurs
+        occurrences = {agent: [] for agent in self.agents}
+        for c, conjunction in enumerate(self.conjunctions):
+            for agent, negated in conjunction:
+                occurrences[agent].append((c, negated))
+        self.occurrences = {agent: tuple(literals) for agent, literals in occurrences.items()}
+
+    def evaluate(self, Y):
+        undetermined = False
+
+        for conjunction in self.conjunctions:
+            outcome = '1'
+            for agent, negated in conjunction:
+                vote = Y[agent]
+                if vote not in D:
+                    outcome = None
+                # A conjunction with a false literal is always false
+                elif (vote == '1') == negated:
+                    outcome = '0'
+                    break
+
+            # A formula with a true conjunction is always true
+            if outcome == '1':
+                return True, '1'
+            elif outcome is None:
+                undetermined = True
+
+        if undetermined:
+            return False, ''
+
+        return True, '0'
+
+    def tracker(self):
+        return FormulaTracker(self)
+
+    def evaluate_issues(self, known, ones, issues):
+        true, false = 0, issues
+
+        for conjunction in self.conjunctions:
+            conjunction_true, conjunction_false = issues, 0
+            for agent, negated in conjunction:
+                literal = known[agent] & ~ones[agent] if negated else ones[agent]
+                conjunction_true &= literal
+                conjunction_false |= known[agent] & ~literal
+            true |= conjunction_true
+            false &= conjunction_false
+
+        return true | false, true
+
+
+class QuotaTracker:
+    """
+    Quota rule of which the known votes '1' and '0' of the participants are
+    counted while the votes are fixed.
+    """
+    __slots__ = ('weight', 'quota', 'ones', 'zeros', 'maximum_zeros')
+
+    def __init__(self, rule):
+        self.weight = rule.weight
+        self.quota = rule.quota
+        self.ones, self.zeros = 0, 0
+        self.maximum_zeros = len(rule.agents) - rule.quota
+
+    def result(self):
+        if self.ones >= self.quota:
+            return True, '1'
+        elif self.zeros > self.maximum_zeros:
+            return True, '0'
+
+        return False, ''
+
+    def assign(self, agent, vote):
+        """
+        Fixes the vote of a participant.
+        return: True and the calculated vote when it is calculable
+                False when the vote is not calculable yet
+        """
+        if vote == '1':
+            self.ones += self.weight[agent]
+        else:
+            self.zeros += self.weight[agent]
+
+        return self.result()
+
+
+class FormulaTracker:
+    """
+    Formula of propositional logic in disjunctive normal form of which every
+    conjunction is pending, satisfied or falsified. A conjunction is falsified by
+    its first false literal and satisfied when all its literals are true, so only
+    the number of true literals per conjunction is kept.
+    """
+    __slots__ = ('occurrences', 'missing', 'falsified', 'pending', 'satisfied')
+
+    def __init__(self, formula):
+        self.occurrences = formula.occurrences
+        # Number of literals of every conjunction that are not true yet
+        self.missing = [len(conjunction) for conjunction in formula.conjunctions]
+        self.falsified = [False] * len(formula.conjunctions)
+        self.pending = len(formula.conjunctions)
+        self.satisfied = False
+
+    def result(self):
+        if self.satisfied:
+            return True, '1'
+        elif self.pending == 0:
+            return True, '0'
+
+        return False, ''
+
+    def assign(self, agent, vote):
+        """
+        Fixes the vote of an agent in the formula, only the conjunctions with
+        this agent are updated.
+        return: True and the calculated vote when it is calculable
+                False when the vote is not calculable yet
+        """
+        for c, negated in self.occurrences[agent]:
+            if self.falsified[c]:
+                continue
+            elif (vote == '1') == negated:
+                self.falsified[c] = True
+                self.pending -= 1
+            else:
+                self.missing[c] -= 1
+                if self.missing[c] == 0:
+                    self.satisfied = True
+
+        return self.result()
+
+
+def add_bits(counter, mask):
+    """
+    Adds one to the count of every issue of which the bit is set in mask. The
+    counter is bit-sliced: counter[i] has bit i of the count of every issue.
+    """
+    for i in range(len(counter)):
+        counter[i], mask = counter[i] ^ mask, counter[i] & mask
+        if not mask:
+            return
+    if mask:
+        counter.append(mask)
+
+def at_least(counter, bound, issues):
+    """
+    return: the mask of the issues of which the count in a bit-sliced counter is at least bound
+    """
+    if bound <= 0:
+        return issues
+    if bound >> len(counter):
+        return 0
+
+    # Compare the bits from the most significant one, keeping the issues that are still equal
+    greater, equal = 0, issues
+    for i in reversed(range(len(counter))):
+        if bound >> i & 1:
+            equal &= counter[i]
+        else:
+            greater |= equal & counter[i]
+            equal &= ~counter[i]
+
+    return greater | equal
+
+
+# Direct votes are shared between all cells
+DIRECT = {vote: DirectVote(vote) for vote in D}
+
+def parse_formula(delegation, index=None):
+    """
+    Parses a formula of propositional logic in disjunctive normal form, in which
+    brackets only group a conjunction of literals and only agents are negated.
+    With index, the agent names are replaced by their agent id.
+    return: a list of conjunctions of (agent, negated) literals
+    """
+    tokens = TOKENS.findall(delegation)
+    conjunctions, literals = [], []
+    bracket = False
+    i = 0
+
+    while True:
+        # A literal, possibly negated and possibly opening a bracket
+        while i < len(tokens) and tokens[i] == '(':
+            if bracket:
+                raise ValueError(f"Nested brackets are not in disjunctive normal form: '{delegation}'")
+            bracket = True
+            i += 1
+
+        negated = i < len(tokens) and tokens[i] == '~'
+        i += negated
+        if negated and i < len(tokens) and tokens[i] == '(':
+            raise ValueError(f"Only agents can be negated in disjunctive normal form: '{delegation}'")
+        elif i == len(tokens) or tokens[i] in OPERATORS:
+            raise ValueError(f"Expected an agent in formula '{delegation}'")
+        literals.append((tokens[i] if index is None else index[tokens[i]], negated))
+        i += 1
+
+        if i < len(tokens) and tokens[i] == ')':
+            if not bracket:
+                raise ValueError(f"Unbalanced brackets in formula '{delegation}'")
+            bracket = False
+            i += 1
+
+        # The literal ends the formula, the conjunction or is followed by another literal
+        if i == len(tokens):
+            if bracket:
+                raise ValueError(f"Unbalanced brackets in formula '{delegation}'")
+            conjunctions.append(literals)
+            return conjunctions
+        elif tokens[i] == '|':
+            if bracket:
+                raise ValueError(f"A disjunction within brackets is not in disjunctive normal form: '{delegation}'")
+            conjunctions.append(literals)
+            literals = []
+        elif tokens[i] != '&':
+            raise ValueError(f"Expected '&' or '|' but found '{tokens[i]}' in formula '{delegation}'")
+        i += 1
+
+def compile_ballot(delegation, index=None):
+    """
+    Compiles a single cell of a smart profile. With index, the agent names are
+    replaced by their agent id.
+    return: the compiled ballot, or None for an empty cell
+    """
+    delegation = delegation.strip()
+
+    if delegation in D:
+        return DIRECT[delegation]
+    elif delegation == '-' or delegation == '':
+        return None
+
+    if 'quota(' in delegation:
+        quota_rule = QUOTA.fullmatch(delegation)
+        if quota_rule is None:
+            raise ValueError(f"A quota rule cannot be combined with other delegations: '{delegation}'")
+        participants, quota = quota_rule.groups()
+        participants = participants.split()
+        if index is not None:
+            participants = [index[participant] for participant in participants]
+        return QuotaRule(participants, int(quota))
+
+    conjunctions = parse_formula(delegation, index)
+    if len(conjunctions) == 1 and len(conjunctions[0]) == 1 and not conjunctions[0][0][1]:
+        return Delegate(conjunctions[0][0][0])
+
+    return Formula(conjunctions)
+
+def compile_profile(profile):
+    """
+    Compiles every cell of a smart profile once.
+    return: dictionary with for each preference level the compiled ballot per agent
+    """
+    ballots = {}
+
+    for level in profile.columns:
+        ballots[level] = {agent: compile_ballot(delegation) for agent, delegation in profile[level].items()}
+
+    return ballots
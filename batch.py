@@ -0,0 +1,189 @@
+"""
+DISCLAIMER: This file was created for the thesis of Romana Wilschut for the
+            bachelor ‘Artificial Intelligence’ at the University of Amsterdam.
+NAME:       Romana Wilschut
+UVA ID:     12156884
+INFO:       This file consists of a batch version of the U and DU unravelling
+            procedures, which unravels a stack of smart profiles with the same
+            number of agents and preference levels at once with NumPy.
+"""
+
+import numpy as np
+from ballots import Formula
+from cycles import simple_cycles
+
+UNKNOWN = -1        # Vote of an agent that is not resolved yet
+
+EMPTY, DIRECT, QUOTA, FORMULA = 0, 1, 2, 3
+
+class BatchProfile:
+    __slots__ = ('size', 'agents', 'levels', 'kind', 'votes', 'participants', 'quota',
+                 'positive', 'negative', 'conjunctions', 'edges')
+
+    def __init__(self, profiles):
+        """
+        Encodes the ballots of a stack of SmartProfiles in arrays with shape
+        (preference levels, profiles, agents, ...). A single delegation is stored as
+        a quota rule with one participant and quota 1, and a participant that is listed
+        more than once in a quota rule counts as often as it is listed.
+        """
+        self.size = len(profiles)
+        self.agents = len(profiles[0].agents)
+        self.levels = len(profiles[0].columns)
+
+        for profile in profiles:
+            if len(profile.agents) != self.agents or len(profile.columns) != self.levels:
+                raise ValueError("All profiles in a batch need the same number of agents and preference levels")
+
+        # Largest number of conjunctions of a formula in the batch
+        width = max([len(ballot.conjunctions) for profile in profiles for level in profile.columns
+                     for ballot in profile.ballots[level] if isinstance(ballot, Formula)], default=1)
+
+        shape = (self.levels, self.size, self.agents)
+        # Direct votes of the profiles, which use UNKNOWN for the other ballots as well
+        self.votes = np.stack([profile.votes for profile in profiles], axis=1)
+        self.kind = np.where(self.votes != UNKNOWN, DIRECT, EMPTY).astype(np.int8)
+        self.participants = np.zeros(shape + (self.agents,), dtype=np.int16)
+        self.quota = np.zeros(shape, dtype=np.int16)
+        self.positive = np.zeros(shape + (width, self.agents), dtype=bool)
+        self.negative = np.zeros(shape + (width, self.agents), dtype=bool)
+        self.conjunctions = np.zeros(shape + (width,), dtype=bool)
+
+        for p, profile in enumerate(profiles):
+            for j, level in enumerate(profile.columns):
+                for agent, ballot in enumerate(profile.ballots[level]):
+                    if ballot is None or ballot.direct:
+                        continue
+                    elif isinstance(ballot, Formula):
+                        self.kind[j, p, agent] = FORMULA
+                        for c, conjunction in enumerate(ballot.conjunctions):
+                            self.conjunctions[j, p, agent, c] = True
+                            for delegate, negated in conjunction:
+                                if negated:
+                                    self.negative[j, p, agent, c, delegate] = True
+                                else:
+                                    self.positive[j, p, agent, c, delegate] = True
+                    else:
+                        self.kind[j, p, agent] = QUOTA
+                        np.add.at(self.participants[j, p, agent], list(ballot.agents), 1)
+                        self.quota[j, p, agent] = getattr(ballot, 'quota', 1)
+
+        # Edges of the delegation graphs
+        self.edges = (self.participants > 0) | (self.positive | self.negative).any(axis=-2)
+
+    def evaluate(self, X):
+        """
+        Computes the outcome of every ballot for the partial vote vectors X.
+        return: array with shape (preference levels, profiles, agents) with the
+                calculated votes, UNKNOWN when the vote is not calculable yet
+        """
+        one = (X == 1)[None, :, None, :]
+        zero = (X == 0)[None, :, None, :]
+
+        # Quota rules
+        ones = (self.participants * one).sum(axis=-1)
+        zeros = (self.participants * zero).sum(axis=-1)
+        size = self.participants.sum(axis=-1)
+        quota = np.where(ones >= self.quota, 1, np.where(zeros > size - self.quota, 0, UNKNOWN))
+
+        # Formulas of propositional logic in disjunctive normal form
+        one, zero = one[..., None, :], zero[..., None, :]
+        # A conjunction is true when none of its literals is false or unknown
+        true = ~((self.positive & ~one) | (self.negative & ~zero)).any(axis=-1)
+        false = ((self.positive & zero) | (self.negative & one)).any(axis=-1)
+        satisfied = (true & self.conjunctions).any(axis=-1)
+        falsified = (false | ~self.conjunctions).all(axis=-1)
+        formula = np.where(satisfied, 1, np.where(falsified, 0, UNKNOWN))
+
+        outcome = np.select([self.kind == DIRECT, self.kind == QUOTA, self.kind == FORMULA],
+                            [self.votes, quota, formula], UNKNOWN)
+
+        return outcome.astype(np.int8)
+
+def unravel_batch(profiles, procedures=('U', 'DU')):
+    """
+    Unravels a stack of SmartProfiles with the U and DU unravelling procedures.
+    return: for every procedure an array with shape (profiles, agents) with the final
+            votes, and for every procedure an array with the number of cycles per profile
+    """
+    batch = profiles if isinstance(profiles, BatchProfile) else BatchProfile(profiles)
+    result = {}
+    number_of_cycles = {}
+
+    for procedure in procedures:
+        if procedure not in ('U', 'DU'):
+            raise ValueError(f"Batch unravelling only supports 'U' and 'DU', not '{procedure}'")
+
+        X, observed = unravel_procedure(batch, procedure)
+        result[procedure] = X
+        number_of_cycles[procedure] = count_cycles(batch, observed)
+
+    return result, number_of_cycles
+
+def unravel_procedure(batch, procedure):
+    """
+    Unravels all profiles of the batch at once. Every round the first preference level
+    with a calculable ballot is updated in each profile that is not resolved yet.
+    return: the final votes and for each preference level the unresolved agents at the
+            first visit of the preference level, see Worklist.observe
+    """
+    X = np.full((batch.size, batch.agents), UNKNOWN, dtype=np.int8)
+    rows = np.arange(batch.size)
+
+    # Unresolved agents per profile at the first visit of each preference level
+    observed = np.zeros((batch.levels, batch.size), dtype=bool)
+    unresolved = np.zeros((batch.levels, batch.size, batch.agents), dtype=bool)
+
+    while True:
+        outcome = batch.evaluate(X)
+        calculable = (outcome != UNKNOWN) & (X == UNKNOWN)[None]
+        found = calculable.any(axis=-1)
+
+        # Profiles that are resolved, or of which no ballot is calculable, are done
+        active = found.any(axis=0)
+        if not active.any():
+            break
+        level = np.argmax(found, axis=0)
+
+        # Preference levels before the updated level are visited unchanged
+        for j in range(batch.levels):
+            first = active & ~observed[j] & (level > j)
+            unresolved[j, first] = X[first] == UNKNOWN
+            observed[j] |= first
+
+        update = calculable[level, rows]
+        if procedure == 'DU':
+            direct = update & (batch.kind[level, rows] == DIRECT)
+            update = np.where(direct.any(axis=-1)[:, None], direct, update)
+        update &= active[:, None]
+        X = np.where(update, outcome[level, rows], X)
+
+        for j in range(batch.levels):
+            first = active & ~observed[j] & (level == j)
+            unresolved[j, first] = X[first] == UNKNOWN
+            observed[j] |= first
+
+    return X, unresolved
+
+def count_cycles(batch, unresolved):
+    """
+    Counts the cycles between the unresolved agents at the first visit of every
+    preference level, except the last one.
+    return: array with the number of cycles per profile
+    """
+    cycles = np.zeros(batch.size, dtype=np.int64)
+
+    for j in range(batch.levels - 1):
+        edges = batch.edges[j] & unresolved[j][:, :, None] & unresolved[j][:, None, :]
+
+        # Remove agents without edges until only agents on or before a cycle are left
+        alive = unresolved[j].copy()
+        for _ in range(batch.agents):
+            alive &= (edges & alive[:, None, :]).any(axis=-1)
+
+        for p in np.flatnonzero(alive.any(axis=-1)):
+            nodes = np.flatnonzero(alive[p]).tolist()
+            successors = {agent: set(np.flatnonzero(edges[p, agent] & alive[p]).tolist()) for agent in nodes}
+            cycles[p] += sum(1 for _ in simple_cycles(successors, nodes))
+
+    return cycles
@@ -0,0 +1,282 @@
+"""
+DISCLAIMER: This file was created for the thesis of Romana Wilschut for the
+            bachelor ‘Artificial Intelligence’ at the University of Amsterdam.
+NAME:       Romana Wilschut
+UVA ID:     12156884
+INFO:       This file consists of a benchmark suite that times the creation of
+            valid smart profiles, the unravelling procedures, the computation of
+            ballots and the detection of cycles over a sweep of the parameters.
+            The timings are written to a JSON file and compared with a baseline.
+"""
+
+import argparse
+import itertools
+import json
+import math
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+import numpy as np
+from ballots import DIRECT, Formula, QuotaRule, compile_ballot
+from create_data import create_data, create_rows
+from cycles import find_cycles
+from setup import SmartVoting, compute_formula, compute_quotarule, create_profile, reset_outcome
+from smartprofile import SmartProfile
+
+FORMAT_VERSION = 1
+TYPES = ['combined', 'quota', 'logic', 'no negation']
+ALGORITHMS = ['U', 'DU', 'RU', 'DRU']
+CASES = ['create_data', 'create_profile', 'compile', 'unravel'] + ALGORITHMS + \
+        ['compute_formula', 'compute_quotarule', 'find_cycles']
+PARAMETERS = ['agents', 'delegations', 'lower', 'upper', 'type']
+
+def configuration_seed(seed, configuration):
+    """
+    Creates the seed of a configuration from the seed of the benchmark and the
+    parameters, so the seed does not change when the sweep changes.
+    return: seed
+    """
+    agents, delegations, lower, upper, type_of_profile = configuration
+    entropy = [seed, agents, delegations, round(lower * 1000), round(upper * 1000), TYPES.index(type_of_profile)]
+    return int(np.random.SeedSequence(entropy).generate_state(1)[0])
+
+def set_seed(seed):
+    random.seed(seed)
+    np.random.seed(seed)
+
+def measure(function, repeat, minimum_time=0.02):
+    """
+    Runs function repeat times, after a run that is not timed so imports and
+    caches do not count. Fast functions are run several times per timing, so
+    every timing takes at least minimum_time seconds.
+    return: list with the elapsed seconds of a single call for every timing
+    """
+    start = time.perf_counter()
+    function()
+    number = max(1, math.ceil(minimum_time / max(time.perf_counter() - start, 1e-9)))
+
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            function()
+        timings.append((time.perf_counter() - start) / number)
+
+    return timings
+
+class Fixture:
+    """
+    The valid smart profiles of a configuration, created once with its seed and
+    shared by all cases of the configuration.
+    """
+    def __init__(self, configuration, seed, amount_profiles, folder):
+        self.configuration = configuration
+        self.seed = seed
+        self.agents, self.delegations, lower, upper, self.type = configuration
+        self.bounds = [lower, upper]
+
+        set_seed(seed)
+        self.rows = [create_rows(self.agents, self.delegations, self.bounds, self.type) for _ in range(amount_profiles)]
+        self.files = [os.path.join(folder, f"{i}.csv") for i in range(amount_profiles)]
+        self.profiles = [SmartProfile(rows) for rows in self.rows]
+
+        # Delegations in the ballots, with a partial vector of the agent names to compute them with
+        cells = [(cell, profile.names) for rows, profile in zip(self.rows, self.profiles) for row in rows for cell in row]
+        ballots = [(cell, compile_ballot(cell), names) for cell, names in cells if cell not in DIRECT]
+        self.formulas = [(cell, self.partial_vector(names)) for cell, ballot, names in ballots if isinstance(ballot, Formula)]
+        self.quotarules = [(cell, self.partial_vector(names)) for cell, ballot, names in ballots if isinstance(ballot, QuotaRule)]
+
+    def partial_vector(self, names):
+        """
+        return: vector Y in which every agent votes '0', '1' or is unresolved
+        """
+        return {name: random.choice(['0', '1', None]) for name in names}
+
+    def create_data(self):
+        set_seed(self.seed)
+        for file in self.files:
+            create_data(file, self.agents, self.delegations, self.bounds, self.type)
+
+    def create_profile(self):
+        for file in self.files:
+            create_profile(file, self.agents, self.delegations)
+
+    def compile(self):
+        for rows in self.rows:
+            SmartProfile(rows)
+
+    def unravel(self):
+        set_seed(self.seed)
+        for profile in self.profiles:
+            SmartVoting(profile).unravel()
+
+    def procedure(self, algorithm):
+        """
+        return: function that unravels every profile with a single unravelling procedure
+        """
+        def run():
+            set_seed(self.seed)
+            for profile in self.profiles:
+                SmartVoting(profile).unravel(procedures=[algorithm])
+
+        return run
+
+    def compute_formula(self):
+        for delegation, Y in self.formulas:
+            compute_formula(Y, delegation)
+
+    def compute_quotarule(self):
+        for delegation, Y in self.quotarules:
+            compute_quotarule(None, Y, delegation)
+
+    def find_cycles(self):
+        for profile in self.profiles:
+            Voting = SmartVoting(profile)
+            reset_outcome(Voting)
+            for level in profile.columns[:-1]:
+                sum(1 for _ in find_cycles(Voting, level))
+
+    def case(self, name):
+        """
+        return: function that runs the case name on all profiles
+        """
+        if name in ALGORITHMS:
+            return self.procedure(name)
+
+        return getattr(self, name)
+
+def sweep(agents, delegations, bounds, types):
+    """
+    return: list of configurations (agents, delegations, lower, upper, type)
+    """
+    return [(a, d, lower, upper, t) for a, d, (lower, upper), t in itertools.product(agents, delegations, bounds, types)]
+
+def run_benchmark(configurations, cases=CASES, amount_profiles=5, repeat=3, seed=0, verbose=True):
+    """
+    Times every case on amount_profiles valid smart profiles of every configuration.
+    return: list with for every case and configuration the parameters and the
+            best and median time per profile in seconds
+    """
+    results = []
+
+    with tempfile.TemporaryDirectory() as folder:
+        for configuration in configurations:
+            fixture = Fixture(configuration, configuration_seed(seed, configuration), amount_profiles, folder)
+            fixture.create_data()
+
+            for name in cases:
+                # find_cycles needs networkx, which is optional
+                try:
+                    timings = measure(fixture.case(name), repeat)
+                except ImportError as error:
+                    if verbose:
+                        print(f"Skipped {name}: {error}", file=sys.stderr)
+                    continue
+
+                result = dict(zip(PARAMETERS, configuration))
+                result.update({'case': name, 'profiles': amount_profiles, 'repeat': repeat,
+                               'best': min(timings) / amount_profiles,
+                               'median': statistics.median(timings) / amount_profiles})
+                results.append(result)
+
+                if verbose:
+                    print(f"{name:18} {configuration} {result['median'] * 1000:10.3f} ms", file=sys.stderr)
+
+    return results
+
+def metadata(seed):
+    """
+    return: information about the machine and the seed of a benchmark
+    """
+    return {'python': platform.python_version(), 'numpy': np.__version__, 'machine': platform.machine(),
+            'processor': platform.processor(), 'system': platform.system(), 'seed': seed,
+            'date': time.strftime('%Y-%m-%dT%H:%M:%S')}
+
+def write_results(file, results, seed):
+    with open(file, 'w') as results_file:
+        json.dump({'version': FORMAT_VERSION, 'metadata': metadata(seed), 'results': results}, results_file, indent=1)
+
+def read_results(file):
+    with open(file) as results_file:
+        data = json.load(results_file)
+
+    if data.get('version') != FORMAT_VERSION:
+        raise ValueError(f"{file} is not a benchmark file of version {FORMAT_VERSION}")
+
+    return data['results']
+
+def key(result):
+    return tuple(result[parameter] for parameter in ['case'] + PARAMETERS)
+
+def compare(results, baseline, threshold=1.25):
+    """
+    Compares the best times with those of a baseline with the same parameters,
+    as the best time is the least sensitive to other processes on the machine.
+    return: list of (result, ratio to the baseline, regression) for every result
+            that also occurs in the baseline
+    """
+    baseline = {key(result): result for result in baseline}
+    comparison = []
+
+    for result in results:
+        if key(result) in baseline:
+            ratio = result['best'] / max(baseline[key(result)]['best'], 1e-12)
+            comparison.append((result, ratio, ratio > threshold))
+
+    return comparison
+
+def scaling(results, parameter='agents'):
+    """
+    Groups the median times to show how every case scales with a parameter,
+    averaged over the other parameters.
+    return: for every case a dictionary from the value of the parameter to the median time
+    """
+    curves = {}
+    for result in results:
+        curves.setdefault(result['case'], {}).setdefault(result[parameter], []).append(result['median'])
+
+    return {case: {value: statistics.mean(times) for value, times in sorted(curve.items())} for case, curve in curves.items()}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the creation and unravelling of valid smart profiles.")
+    parser.add_argument('--agents', type=int, nargs='+', default=[5, 10, 15])
+    parser.add_argument('--delegations', type=int, nargs='+', default=[2, 4, 6])
+    parser.add_argument('--bounds', nargs='+', default=['0:1', '0.5:1'], help="delegation bounds as lower:upper")
+    parser.add_argument('--types', nargs='+', default=TYPES, choices=TYPES)
+    parser.add_argument('--cases', nargs='+', default=CASES, choices=CASES)
+    parser.add_argument('--profiles', type=int, default=5, help="profiles per configuration")
+    parser.add_argument('--repeat', type=int, default=3, help="runs per case")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default='benchmark.json', help="file of the results")
+    parser.add_argument('--baseline', default=None, help="results to compare with")
+    parser.add_argument('--threshold', type=float, default=1.25, help="slowdown that counts as a regression")
+    parser.add_argument('--scaling', default='agents', choices=PARAMETERS, help="parameter of the scaling curves")
+    args = parser.parse_args(argv)
+
+    bounds = [tuple(float(bound) for bound in bounds.split(':')) for bounds in args.bounds]
+    configurations = sweep(args.agents, args.delegations, bounds, args.types)
+
+    results = run_benchmark(configurations, args.cases, args.profiles, args.repeat, args.seed)
+    write_results(args.output, results, args.seed)
+
+    print(f"\nMedian time per profile in ms by {args.scaling}")
+    for case, curve in scaling(results, args.scaling).items():
+        print(f"{case:18}", '  '.join(f"{value}: {seconds * 1000:.3f}" for value, seconds in curve.items()))
+
+    if args.baseline is not None:
+        comparison = compare(results, read_results(args.baseline), args.threshold)
+        regressions = [(result, ratio) for result, ratio, regression in comparison if regression]
+
+        print(f"\n{len(comparison)} results compared with {args.baseline}, {len(regressions)} regressions")
+        for result, ratio in regressions:
+            print(f"{result['case']:18} {key(result)[1:]} {ratio:.2f}x slower")
+
+        if regressions:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -9,101 +9,141 @@ INFO:       This file contains a function that generates a random smart ballot
 
 import random
 import numpy as np
-import string
-import copy
-from sympy.logic.boolalg import to_dnf
-import re
 from itertools import combinations
 import math
+import os
+from functools import lru_cache
+from smartprofile import SmartProfile, agent_names
+
+# Largest number of conjunctions of a quota rule that is compared with formulas,
+# a created formula of at most 20 characters has fewer conjunctions
+MAXIMAL_EXPANSION = 8
 
 def create_data(file, number_of_agents, maximal_delegations, delegation_bounds, profile):
     """
     Creates a valid smart profile according to the parameters.
     """
-    agents = list(string.ascii_uppercase)[:number_of_agents]
-    outcome = ['0', '1']
+    write_profile(file, create_rows(number_of_agents, maximal_delegations, delegation_bounds, profile))
+
+def write_profile(file, rows):
+    """
+    Writes the delegation ballots of a valid smart profile to a file.
+    """
+    with open(file, 'w') as new_file:
+        for row in rows:
+            new_file.write(', '.join(row) + "\n")
 
+def create_rows(number_of_agents, maximal_delegations, delegation_bounds, profile):
+    """
+    Creates the delegation ballots of a valid smart profile according to the parameters.
+    return: for every agent the delegation ballot as a list of cells
+    """
+    agents = agent_names(number_of_agents)
     lower_bound, upper_bound = delegation_bounds[0], delegation_bounds[1]
 
-    with open(file, 'w') as new_file:
-        for i in range(number_of_agents):
-            # Create list with all possible agents to which an agent can delegate
-            possible_agents = copy.deepcopy(agents)
-            possible_agents.pop(i)
-
-            # Get the probability that an agent will delegate his vote
-            prob_delegation = np.random.uniform(lower_bound, upper_bound, size=None)
-            # Create empty delegation ballot
-            ballot = ''
-
-            for j in range(maximal_delegations):
-                # Agent chooses to delegate  his vote or directly vote with a wieghted uniform distribution
-                choice = random.choices(['delegate', 'direct vote'], weights = [prob_delegation, 1-prob_delegation])
-                
-                # In the last preference level, the agent is obligated to vote directly
-                if choice[0] == 'direct vote' or (j+1) == maximal_delegations:
-                    ballot += random.choice(outcome) + ', '
-                    # The delegation ballot of an agent is terminated when one votes directly votes
-                    break
-                elif choice[0] == 'delegate':
-                    counter = 0
-                    # Agents can try 10 times to make a new delegation
-                    while counter < 10:
-                        delegation = ''
-                        # Agent chooses random subset of agent to whom he wants to delegate
-                        candidates = random.sample(possible_agents, random.choice(range(1, len(possible_agents)+1)))
-
-                        # Agent wants to delegate to a single agent
-                        if len(candidates) == 1:
-                            if profile == 'no negation':
-                                delegation += candidates[0] + ', '
-                            else:
-                                delegation += random.choice(['', '~']) + candidates[0] + ', '
-
-                        else:
-                            delegation_type = ""
-                            if profile == 'combined':
-                                delegation_type = random.choice(['quota', 'logic'])
-
-                            if profile == 'quota' or delegation_type == 'quota':
-                                delegation = create_quotarule(delegation, candidates, profile)
-                            elif profile == 'logic' or profile == 'no negation' or delegation_type == 'logic': 
-                                delegation = create_formula(delegation, candidates, profile)
-
-                        # Check if the delegation did not already occur in the ballot
-                        if delegation not in ballot.split(', '):
-                            if profile == 'combined':
-                                # Check whether the quota rule already exists in the ballot as logical formula
-                                if re.search(r"quota\((.*?)\)", delegation):
-                                    quota_agents, quota = re.findall(r"quota\((.*?)\)", delegation)[0].split(',')
-                                    quota_agents = quota_agents.split()
-
-                                    if len(quota_agents) == int(quota):
-                                        if duplicate_unanimity(delegation, ballot):
-                                            counter += 1
-                                            continue
-                                    else:
-                                        if duplicate_majority(delegation, ballot):
-                                            counter += 1
-                                            continue 
-                            
-                            ballot += delegation
-                            break
-
-                        counter += 1
-
-                    if counter == 10:
-                        ballot += random.choice(outcome) + ', '
-                        break
-        
-            # Write delegation ballot to file
-            new_file.write(ballot[:-2] + "\n")
-
-def create_quotarule(delegation, candidates, profile):
+    return [create_ballot(i, agents, maximal_delegations, lower_bound, upper_bound, profile) for i in range(number_of_agents)]
+
+def generate_profiles(amount_profiles, number_of_agents, maximal_delegations, delegation_bounds, profile, folder=None):
+    """
+    Lazily creates valid smart profiles according to the parameters, without a file
+    in between. When a folder is given, every profile is also written to a file.
+    return: generator of SmartProfiles
+    """
+    for i in range(1, amount_profiles + 1):
+        rows = create_rows(number_of_agents, maximal_delegations, delegation_bounds, profile)
+
+        if folder is not None:
+            file = f"{i}_{number_of_agents}_{maximal_delegations}_{delegation_bounds[0]}_{delegation_bounds[1]}.csv"
+            write_profile(os.path.join(folder, file), rows)
+
+        yield SmartProfile(rows)
+
+def create_ballot(i, agents, maximal_delegations, lower_bound, upper_bound, profile):
+    """
+    Creates the delegation ballot of agent i, who can delegate to all other agents.
+    return: the delegation ballot as a list of cells
+    """
+    # Create list with all possible agents to which an agent can delegate
+    possible_agents = agents[:i] + agents[i+1:]
+
+    return create_delegations(possible_agents, maximal_delegations, lower_bound, upper_bound, profile)
+
+def create_delegations(possible_agents, maximal_delegations, lower_bound, upper_bound, profile, maximal_size=None):
+    """
+    Creates a delegation ballot with delegations to the possible agents. A delegation
+    is only added when no equivalent delegation is in the ballot yet, see canonical_form.
+    maximal_size: largest number of agents in a delegation, None for no limit
+    return: the delegation ballot as a list of cells
+    """
+    outcome = ['0', '1']
+
+    # Get the probability that an agent will delegate his vote
+    prob_delegation = np.random.uniform(lower_bound, upper_bound, size=None)
+    # Create empty delegation ballot, with the canonical forms of its delegations
+    ballot = []
+    forms = set()
+
+    for j in range(maximal_delegations):
+        # Agent chooses to delegate  his vote or directly vote with a wieghted uniform distribution
+        choice = random.choices(['delegate', 'direct vote'], weights = [prob_delegation, 1-prob_delegation])
+
+        # In the last preference level, the agent is obligated to vote directly
+        if choice[0] == 'direct vote' or (j+1) == maximal_delegations or not possible_agents:
+            ballot.append(random.choice(outcome))
+            # The delegation ballot of an agent is terminated when one votes directly votes
+            break
+
+        # Agents can try 10 times to make a new delegation
+        for _ in range(10):
+            delegation, form = create_delegation(possible_agents, profile, maximal_size)
+
+            # Check if the delegation or an equivalent one did not already occur in the ballot
+            if form not in forms:
+                forms.add(form)
+                ballot.append(delegation)
+                break
+        else:
+            ballot.append(random.choice(outcome))
+            break
+
+    return ballot
+
+def create_delegation(possible_agents, profile, maximal_size=None):
+    """
+    Creates a delegation to a random subset of the possible agents, of at most
+    maximal_size agents when it is given.
+    return: the delegation as cell and its canonical form
+    """
+    size = len(possible_agents) if maximal_size is None else min(len(possible_agents), maximal_size)
+
+    # Agent chooses random subset of agent to whom he wants to delegate
+    candidates = random.sample(possible_agents, random.choice(range(1, size+1)))
+
+    # Agent wants to delegate to a single agent
+    if len(candidates) == 1:
+        negated = profile != 'no negation' and random.choice(['', '~']) == '~'
+        clauses = frozenset([frozenset([(candidates[0], negated)])])
+        return ('~' if negated else '') + candidates[0], canonical_form(clauses)
+
+    delegation_type = profile
+    if profile == 'combined':
+        delegation_type = random.choice(['quota', 'logic'])
+
+    if delegation_type == 'quota':
+        participants, quota = create_quotarule(candidates, profile)
+        # The conjunctions of a quota rule never contain each other, so they are canonical already
+        clauses = quota_clauses(participants, quota)
+        form = ('quota', frozenset(participants), quota) if clauses is None else clauses
+        return f"quota({' '.join(participants)},{quota})", form
+
+    clauses = create_formula(candidates, profile)
+    return normalise_formula(clauses), canonical_form(clauses)
+
+def create_quotarule(candidates, profile):
     """
     Create quota rule
+    return: the sorted participants and the quota
     """
-    delegation += 'quota('
     candidates = sorted(candidates)
 
     if profile == 'combined':
@@ -111,22 +151,24 @@ def create_quotarule(delegation, candidates, profile):
         quota = random.choice([quota, len(candidates)])
     else:
         quota = random.choice(range(1, len(candidates)+1))
-    
-    for c in candidates:
-        delegation += c + ' '
 
-    return delegation[:-1] + f',{quota}), '
+    return candidates, quota
 
-def create_formula(delegation, candidates, profile):
+def create_formula(candidates, profile):
     """
     Create formula of propostional logic
+    return: the disjunction of conjunctions as a frozenset of frozensets of (agent, negated) literals
     """
-    single_character = []
-    outside = []
+    single_character = set()
+    outside = set()
+
+    # Written subformulas with their literals, and the length of the formula with
+    # and without spaces when it is written as ‘subformula | subformula | ’
+    subformulas = {}
+    length, no_spaces = 0, 0
 
-    while len(delegation) <= 20:
-        no_spaces = copy.deepcopy(delegation.replace(' ', ''))
-        max_agents = int(math.ceil((20 - len(no_spaces))/2))
+    while length <= 20:
+        max_agents = int(math.ceil((20 - no_spaces)/2))
 
         # Choose candidates for in bracket
         if max_agents < len(candidates):
@@ -139,91 +181,98 @@ def create_formula(delegation, candidates, profile):
         else:
             negations = ['', '~']
 
-        subformula = ""
-        temp_agents = []
-
         if len(formula_candidates) != 1:
-            subformula += '('
-            for c in sorted(formula_candidates):
+            literals = []
+            temp_agents = []
+            for c in formula_candidates:
                 if f'~{c}' in single_character:
-                    c = f'~{c}'
-                    subformula +=  c + ' & '
+                    literals.append(f'~{c}')
                 elif c in single_character:
-                    subformula +=  c + ' & '
+                    literals.append(c)
                 else:
                     c = random.choice(negations) + c
-                    subformula +=  c + ' & '
-
+                    literals.append(c)
                     temp_agents.append(c)
 
-            subformula = subformula[:-3] + ')'
-            if subformula not in delegation:
-                delegation += subformula + ' | '
-                for c in temp_agents:
-                    single_character.append(c)
+            subformula = '(' + ' & '.join(literals) + ')'
+            if subformula not in subformulas:
+                subformulas[subformula] = literals
+                single_character.update(temp_agents)
+            else:
+                subformula = None
         else:
             c = formula_candidates[0]
 
             if f'~{c}' in single_character:
-                subformula += f"~{c}"
+                subformula = f"~{c}"
             elif c in single_character:
-                subformula += c 
+                subformula = c
             else:
-                c = random.choice(negations) + c 
-                subformula += c 
+                subformula = random.choice(negations) + c
 
             if subformula not in outside:
-                delegation += subformula + ' | '
-                single_character.append(subformula)
-                outside.append(subformula)
+                subformulas[subformula] = [subformula]
+                single_character.add(subformula)
+                outside.add(subformula)
+            else:
+                subformula = None
 
-        if random.choice([True, False]) and delegation != '':
+        if subformula is not None:
+            length += len(subformula) + 3
+            no_spaces += len(subformula.replace(' ', '')) + 1
+
+        if random.choice([True, False]) and subformulas:
             break
 
-    delegation = to_dnf(delegation[:-3].lower())
-    delegation = str(delegation).upper() + ', '
-
-    return delegation
-
-def duplicate_majority(delegation, ballot):
-    """
-    Check if quota rule which represents the majority occurs in the ballot
-    as a formula of propositional logic.
-    return: True if it is a duplicate
-            False if it is not a duplicate
-    """
-    agents, _ = re.findall(r"\((.*?)\)", delegation)[0].split(',')
-    agents = agents.split()
-    
-    comb = list(combinations(agents, len(agents)-1))
-    
-    for i, c in enumerate(comb):
-        comb[i] = '&'.join(c)
-    for delegate in ballot.split(', '):
-        brackets = re.findall(r"\((.*?)\)", delegate)
-        
-        if set(comb) == set(brackets):
-            for b in brackets:
-                delegate = delegate.replace('('+b+')', '')
-            
-            if not re.search(r"[a-zA-Z]", delegate):
-                return True
-                
-    return False
-
-def duplicate_unanimity(delegation, ballot):
-    """
-    Check if quota rule which represents the unanimity occurs in the ballot
-    as a formula of propositional logic.
-    return: True if it is a duplicate
-            False if it is not a duplicate
-    """
-    agents, _ = re.findall(r"\((.*?)\)", delegation)[0].split(',')
-    agents = agents.split()
-    delegate = ' & '.join(agents) 
-
-    if delegate in ballot.split(', '):
-        return True
-
-    return False
-    
\ No newline at end of file
+    literal = lambda text: (text.lstrip('~'), text.startswith('~'))
+    return frozenset(frozenset(literal(text) for text in literals) for literals in subformulas.values())
+
+def quota_clauses(participants, quota):
+    """
+    Writes a quota rule as the disjunction of all conjunctions of quota participants,
+    when this disjunction has at most MAXIMAL_EXPANSION conjunctions.
+    return: frozenset of frozensets of (agent, negated) literals, or None when it is too large
+    """
+    if math.comb(len(participants), quota) > MAXIMAL_EXPANSION:
+        return None
+
+    return frozenset(frozenset((agent, False) for agent in c) for c in combinations(participants, quota))
+
+def canonical_form(clauses):
+    """
+    Canonical form of a formula, which is the same for the equivalent delegations
+    that are created: contradictory conjunctions are removed and a conjunction that
+    contains another conjunction is absorbed by it. A quota rule with more than
+    MAXIMAL_EXPANSION conjunctions keeps its participants and quota as its form.
+    return: frozenset of frozensets of (agent, negated) literals
+    """
+    clauses = [c for c in clauses if not any((agent, not negated) in c for agent, negated in c)]
+    return frozenset(c for c in clauses if not any(other < c for other in clauses))
+
+def literal_key(literal):
+    """
+    Orders agents before negated agents, and agents by name.
+    """
+    agent, negated = literal
+    return negated, agent
+
+@lru_cache(maxsize=4096)
+def normalise_formula(clauses):
+    """
+    Writes a disjunction of conjunctions of (agent, negated) literals in the
+    normal form of sympy's to_dnf: single literals before conjunctions, conjunctions
+    with fewer agents and negations before larger ones and agents before negated agents.
+    return: the formula of propositional logic as string
+    """
+    text = lambda literal: ('~' if literal[1] else '') + literal[0]
+    conjunctions = [sorted(conjunction, key=literal_key) for conjunction in clauses]
+
+    literals = sorted((c[0] for c in conjunctions if len(c) == 1), key=literal_key)
+    conjunctions = sorted((c for c in conjunctions if len(c) > 1), key=lambda c: (len(c) + sum(l[1] for l in c), len(c), [literal_key(l) for l in c]))
+
+    # A single conjunction is written without brackets
+    if not literals and len(conjunctions) == 1:
+        return ' & '.join(text(literal) for literal in conjunctions[0])
+
+    return ' | '.join([text(literal) for literal in literals] +
+                      ['(' + ' & '.join(text(literal) for literal in c) + ')' for c in conjunctions])
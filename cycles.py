@@ -4,22 +4,39 @@ DISCLAIMER: This file was created for the thesis of Romana Wilschut for the
 NAME:       Romana Wilschut 
 UVA ID:     12156884
 INFO:       This file consists of a function that finds all cycles in a 
-            preference level of a valid smart profile.
+            preference level of a valid smart profile, of a counter for these
+            cycles and of a delegation graph that keeps track of the cycles of a
+            preference level while agents are resolved.
 """
 
-import networkx as nx
+import time
 
-def find_cycles(Voting, preference_level):
+METRICS = ['exact', 'length', 'scc']
+
+def linked_agents(Voting, preference_level):
     """
-    Finds all cycles that occur in a preference level.
-    returns: all found cycles
+    Finds for every unresolved agent the agents in its ballot at a preference level.
+    return: dictionary with the linked agents of every agent
     """
     linked = {agent : [] for agent in Voting.agents}
 
-    for i, line in enumerate(Voting.profile[preference_level]):
-        for agent in Voting.agents:
-            if agent in line and Voting.X[Voting.agents[i]] is None:
-                linked[Voting.agents[i]].append(agent)
+    ballots = Voting.ballots[preference_level]
+    for agent in Voting.agents:
+        ballot = ballots[agent]
+        if ballot is not None and Voting.X[agent] is None:
+            linked[agent].extend(set(ballot.agents))
+
+    return linked
+
+def find_cycles(Voting, preference_level, length_bound=None):
+    """
+    Finds all cycles that occur in a preference level, or only the cycles
+    up to length_bound agents.
+    returns: all found cycles
+    """
+    import networkx as nx
+
+    linked = linked_agents(Voting, preference_level)
 
     g = nx.DiGraph()
     g.add_nodes_from(linked.keys())
@@ -27,7 +44,345 @@ def find_cycles(Voting, preference_level):
     for agent, dependent_agents in linked.items():
         g.add_edges_from(([(agent, linked_agent) for linked_agent in dependent_agents]))
 
-    cycles = nx.simple_cycles(g)
+    cycles = nx.simple_cycles(g, length_bound)
     
-    return cycles    
-        
+    return cycles
+
+def add_cycles(Voting, cycles, preference_level):
+    """
+    Adds the cycles that occur in a preference level to the cycle counter ‘cycles’.
+    """
+    if cycles.metric == 'scc':
+        linked = linked_agents(Voting, preference_level)
+        cycles.add_components(preference_level, lambda: strongly_connected_components(set(linked), linked))
+    else:
+        cycles.add(preference_level, find_cycles(Voting, preference_level, cycles.max_length))
+
+class CycleCounter:
+    def __init__(self, levels, metric='exact', max_cycles=None, time_budget=None, max_length=None):
+        """
+        Counts the cycles of the preference levels while unravelling a profile.
+        metric: 'exact' counts all different cycles, 'length' only the cycles up
+                to max_length agents and 'scc' summarises each preference level with
+                the sizes of its strongly connected components that contain a cycle
+        max_cycles, time_budget: stop counting after this number of cycles or seconds
+        """
+        if metric not in METRICS:
+            raise ValueError(f"Unknown cycle metric '{metric}', choose from {METRICS}")
+        if metric == 'length' and max_length is None:
+            raise ValueError("The cycle metric 'length' needs a max_length")
+
+        self.metric = metric
+        self.max_cycles = max_cycles
+        self.time_budget = time_budget
+        self.max_length = max_length if metric == 'length' else None
+        self.truncated = False
+        self.total = 0
+
+        # Number of cycle searches, of enumerated cycles including duplicates and the time spent
+        self.searches = 0
+        self.enumerated = 0
+        self.seconds = 0.0
+
+        self.cycles = {level: set() for level in levels}
+        self.components = {}
+
+        self.deadline = None
+        if time_budget is not None:
+            self.deadline = time.perf_counter() + time_budget
+
+    def add(self, preference_level, found_cycles):
+        """
+        Adds found cycles to the set of a preference level, with every cycle
+        rotated to start at its first agent.
+        """
+        if preference_level not in self.cycles or self.truncated:
+            return
+
+        start = time.perf_counter()
+        self.searches += 1
+        try:
+            self.add_rotated(preference_level, found_cycles)
+        finally:
+            self.seconds += time.perf_counter() - start
+
+    def add_rotated(self, preference_level, found_cycles):
+        for cycle in found_cycles:
+            self.enumerated += 1
+            first_letter = sorted(cycle)[0]
+            index = cycle.index(first_letter)
+            cycle = tuple(cycle[index:] + cycle[:index])
+
+            if cycle not in self.cycles[preference_level]:
+                self.cycles[preference_level].add(cycle)
+                self.total += 1
+
+            # Stop counting when a bound is reached
+            if self.max_cycles is not None and self.total >= self.max_cycles:
+                self.truncated = True
+                return
+            if self.deadline is not None and time.perf_counter() > self.deadline:
+                self.truncated = True
+                return
+
+    def add_count(self, preference_level, count_cycles):
+        """
+        Adds the number of cycles of a preference level at once, which is only exact
+        without a bound on the number of cycles or the time, see bounded.
+        """
+        if preference_level not in self.cycles or self.truncated:
+            return
+
+        start = time.perf_counter()
+        self.searches += 1
+        count = count_cycles()
+        self.enumerated += count
+        self.total += count
+        self.seconds += time.perf_counter() - start
+
+    def bounded(self):
+        """
+        return: True when counting stops after a number of cycles or seconds
+        """
+        return self.max_cycles is not None or self.time_budget is not None
+
+    def add_components(self, preference_level, find_components):
+        """
+        Saves the sizes of the strongly connected components at the first visit
+        of a preference level, later visits only split these components.
+        """
+        if preference_level not in self.cycles or preference_level in self.components:
+            return
+
+        start = time.perf_counter()
+        self.searches += 1
+        self.components[preference_level] = sorted((len(c) for c in find_components()), reverse=True)
+        self.seconds += time.perf_counter() - start
+
+    def count(self):
+        """
+        return: the number of cycles, or for each preference level the sizes of the
+                strongly connected components
+        """
+        if self.metric == 'scc':
+            return {level: self.components.get(level, []) for level in self.cycles}
+
+        return self.total
+
+    def bound(self):
+        """
+        return: the bounds that were used for the metric
+        """
+        if self.metric == 'scc':
+            return {}
+        elif self.metric == 'length':
+            return {'max_length': self.max_length, 'max_cycles': self.max_cycles, 'time_budget': self.time_budget}
+
+        return {'max_cycles': self.max_cycles, 'time_budget': self.time_budget}
+
+def strongly_connected_components(nodes, successors):
+    """
+    Finds the strongly connected components of the graph restricted to nodes,
+    with an iterative version of Tarjan's algorithm.
+    return: list of components that contain a cycle
+    """
+    index, lowlink = {}, {}
+    stack, on_stack = [], set()
+    components = []
+
+    for root in nodes:
+        if root in index:
+            continue
+
+        index[root] = lowlink[root] = len(index)
+        stack.append(root)
+        on_stack.add(root)
+        work = [(root, iter(successors[root]))]
+
+        while work:
+            node, neighbours = work[-1]
+            for neighbour in neighbours:
+                if neighbour not in nodes:
+                    continue
+                if neighbour not in index:
+                    index[neighbour] = lowlink[neighbour] = len(index)
+                    stack.append(neighbour)
+                    on_stack.add(neighbour)
+                    work.append((neighbour, iter(successors[neighbour])))
+                    break
+                elif neighbour in on_stack:
+                    lowlink[node] = min(lowlink[node], index[neighbour])
+            else:
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    lowlink[parent] = min(lowlink[parent], lowlink[node])
+
+                # Node is the root of a component
+                if lowlink[node] == index[node]:
+                    component = set()
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        component.add(member)
+                        if member == node:
+                            break
+
+                    if len(component) > 1 or node in successors[node]:
+                        components.append(component)
+
+    return components
+
+def simple_cycles(successors, nodes, length_bound=None):
+    """
+    Finds all cycles in the graph restricted to nodes with Johnson's algorithm,
+    or only the cycles up to length_bound agents with a bounded search.
+    returns: all found cycles
+    """
+    for node in nodes:
+        if node in successors[node]:
+            yield [node]
+
+    if length_bound is not None:
+        yield from bounded_cycles(successors, nodes, length_bound)
+        return
+
+    components = [c for c in strongly_connected_components(set(nodes), successors) if len(c) > 1]
+
+    while components:
+        component = components.pop()
+        start = component.pop()
+        linked = lambda node: [n for n in successors[node] if n != node and (n in component or n == start)]
+
+        path = [start]
+        blocked, closed = {start}, set()
+        B = {}
+        stack = [(start, linked(start))]
+
+        while stack:
+            node, neighbours = stack[-1]
+            if neighbours:
+                neighbour = neighbours.pop()
+                if neighbour == start:
+                    yield path[:]
+                    closed.update(path)
+                elif neighbour not in blocked:
+                    path.append(neighbour)
+                    stack.append((neighbour, linked(neighbour)))
+                    closed.discard(neighbour)
+                    blocked.add(neighbour)
+                    continue
+
+            if not neighbours:
+                # Unblock the node when a cycle was found through it
+                if node in closed:
+                    unblock = {node}
+                    while unblock:
+                        member = unblock.pop()
+                        if member in blocked:
+                            blocked.remove(member)
+                            unblock.update(B.pop(member, ()))
+                else:
+                    for neighbour in linked(node):
+                        B.setdefault(neighbour, set()).add(node)
+                stack.pop()
+                path.pop()
+
+        # Search the rest of the component without the start node
+        components.extend(c for c in strongly_connected_components(component, successors) if len(c) > 1)
+
+def bounded_cycles(successors, nodes, length_bound):
+    """
+    Finds the cycles of at most length_bound agents, every cycle is found from
+    its first node in the order of nodes.
+    returns: all found cycles
+    """
+    order = {node: i for i, node in enumerate(nodes)}
+
+    for start in nodes:
+        path = [start]
+        stack = [iter(successors[start])]
+        while stack:
+            for neighbour in stack[-1]:
+                if neighbour == start and len(path) > 1:
+                    yield path[:]
+                elif neighbour in order and order[neighbour] > order[start] and neighbour not in path and len(path) < length_bound:
+                    path.append(neighbour)
+                    stack.append(iter(successors[neighbour]))
+                    break
+            else:
+                stack.pop()
+                path.pop()
+
+class DelegationGraph:
+    def __init__(self, agents, ballots):
+        """
+        Builds the delegation graph of a preference level once per profile.
+        Only the strongly connected components that contain a cycle are kept.
+        """
+        self.successors = {}
+        for agent in agents:
+            ballot = ballots[agent]
+            self.successors[agent] = set(ballot.agents) if ballot is not None else set()
+
+        self.initial = strongly_connected_components(set(self.successors), self.successors)
+        # Number of cycles of every component that was counted, per bound on the length
+        self.counts = {}
+        self.reset()
+
+    def reset(self):
+        """
+        Restores the graph in which all agents are unresolved.
+        """
+        self.components = {}
+        self.component = {}
+        self.counter = 0
+
+        for component in self.initial:
+            self.add_component(set(component))
+
+    def add_component(self, component):
+        self.components[self.counter] = component
+        for agent in component:
+            self.component[agent] = self.counter
+        self.counter += 1
+
+    def remove(self, agent):
+        """
+        Removes a resolved agent, only the component of this agent is split again.
+        """
+        if agent not in self.component:
+            return
+
+        component = self.components.pop(self.component.pop(agent))
+        component.discard(agent)
+        for member in component:
+            del self.component[member]
+
+        for new_component in strongly_connected_components(component, self.successors):
+            self.add_component(new_component)
+
+    def cycles(self, length_bound=None):
+        """
+        Finds all cycles in the components of the unresolved agents, or only
+        the cycles up to length_bound agents.
+        returns: all found cycles
+        """
+        for component in self.components.values():
+            yield from simple_cycles(self.successors, component, length_bound)
+
+    def count_cycles(self, length_bound=None):
+        """
+        Counts the cycles in the components of the unresolved agents. The cycles of a
+        component only depend on its agents, so every component is counted once,
+        also when it occurs again while unravelling with another procedure.
+        return: the number of cycles
+        """
+        total = 0
+        for component in self.components.values():
+            key = (frozenset(component), length_bound)
+            if key not in self.counts:
+                self.counts[key] = sum(1 for _ in simple_cycles(self.successors, component, length_bound))
+            total += self.counts[key]
+
+        return total
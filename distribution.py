@@ -0,0 +1,237 @@
+"""
+DISCLAIMER: This file was created for the thesis of Romana Wilschut for the
+            bachelor ‘Artificial Intelligence’ at the University of Amsterdam.
+NAME:       Romana Wilschut
+UVA ID:     12156884
+INFO:       This file computes the distribution of the outcome of the random
+            unravelling procedures RU and DRU. A profile is unravelled many times
+            with the same worklist engine until the confidence intervals of the
+            probabilities are narrow enough, or the distribution is computed
+            exactly from the partial vote vectors that can be reached.
+"""
+
+import math
+import os
+import random
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from statistics import NormalDist
+import numpy as np
+from setup import SmartVoting, majority
+from worklist import Worklist
+
+RANDOM_ALGORITHMS = ['RU', 'DRU']
+
+# Smart voting model of the profile in a worker process
+worker_voting = None
+
+def sample(Voting, procedure, trials, seed):
+    """
+    Unravels a profile trials times with a random unravelling procedure. The
+    worklist engine of the profile is built once and reused by every trial,
+    and no cycles are counted.
+    return: how often each collective decision occurred, and for every agent how
+            often each final vote occurred
+    """
+    if procedure not in RANDOM_ALGORITHMS:
+        raise ValueError(f"Unknown random unravelling procedure '{procedure}', choose from {RANDOM_ALGORITHMS}")
+    if Voting.worklist is None:
+        Voting.worklist = Worklist(Voting, Voting.prepare())
+
+    collective = Counter()
+    votes = {agent: Counter() for agent in Voting.agents}
+
+    # The random state of the caller is restored afterwards
+    state = random.getstate()
+    random.seed(seed)
+    try:
+        for _ in range(trials):
+            X = Voting.worklist.unravel(procedure, None)
+            collective[majority(X)] += 1
+            for agent, vote in X.items():
+                votes[agent][vote] += 1
+    finally:
+        random.setstate(state)
+
+    return collective, votes
+
+def batch_seed(seed, batch):
+    """
+    return: the seed of a batch of trials, which only depends on the seed and the index of the batch
+    """
+    return int(np.random.SeedSequence([seed, batch]).generate_state(1)[0])
+
+def interval(successes, trials, z):
+    """
+    Wilson score interval of a probability, which is also sensible for
+    probabilities close to 0 or 1.
+    return: the estimated probability and the lower and upper bound
+    """
+    p = successes / trials
+    denominator = 1 + z * z / trials
+    centre = (p + z * z / (2 * trials)) / denominator
+    half = z * math.sqrt(p * (1 - p) / trials + z * z / (4 * trials * trials)) / denominator
+
+    return p, max(0.0, centre - half), min(1.0, centre + half)
+
+def estimate(collective, votes, trials, z):
+    """
+    return: the estimated distributions with their intervals, and the width of the widest interval
+    """
+    distribution = {'collective': {decision: interval(collective[decision], trials, z) for decision in ['0', '1', 'tie']},
+                    'votes': {agent: {vote: interval(count[vote], trials, z) for vote in sorted(count, key=str)}
+                              for agent, count in votes.items()}}
+
+    intervals = list(distribution['collective'].values())
+    intervals += [bounds for agent_votes in distribution['votes'].values() for bounds in agent_votes.values()]
+    width = max(high - low for _, low, high in intervals)
+
+    return distribution, width
+
+def start_worker(profile, agents):
+    global worker_voting
+    worker_voting = SmartVoting(profile, agents)
+
+def sample_in_worker(procedure, trials, seed):
+    return sample(worker_voting, procedure, trials, seed)
+
+def outcome_distribution(Voting, procedure='RU', width=0.02, confidence=0.95, batch=200, max_trials=100000,
+                         seed=0, workers=0):
+    """
+    Estimates the probability of each collective decision and of each final vote
+    of every agent under a random unravelling procedure. Trials are run in batches
+    until every confidence interval is at most width wide, or max_trials is reached.
+    Every batch has its own seed, so the result does not depend on the number of workers.
+    workers: number of processes, None for one per core and 0 to run in this process
+    return: dictionary with the number of trials, whether the width was reached, and
+            for each collective decision and for every agent and final vote the
+            probability with the lower and upper bound of its confidence interval
+    """
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    collective = Counter()
+    votes = {agent: Counter() for agent in Voting.agents}
+    trials, index = 0, 0
+    distribution, reached = None, math.inf
+
+    executor = None
+    if workers != 0:
+        workers = workers or os.cpu_count()
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=start_worker,
+                                       initargs=(Voting.profile, Voting.agents))
+    try:
+        while trials < max_trials:
+            # A round has one batch per worker, batches after the stopping point are not used
+            sizes = [min(batch, max_trials - trials - k * batch) for k in range(max(workers, 1))]
+            sizes = [n for n in sizes if n > 0]
+            seeds = [batch_seed(seed, index + k) for k in range(len(sizes))]
+
+            if executor is None:
+                samples = [sample(Voting, procedure, sizes[0], seeds[0])]
+            else:
+                samples = list(executor.map(sample_in_worker, [procedure] * len(sizes), sizes, seeds))
+
+            for n, (batch_collective, batch_votes) in zip(sizes, samples):
+                collective.update(batch_collective)
+                for agent, count in batch_votes.items():
+                    votes[agent].update(count)
+                trials += n
+                index += 1
+
+                distribution, reached = estimate(collective, votes, trials, z)
+                if reached <= width:
+                    break
+
+            if reached <= width:
+                break
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    return {'procedure': procedure, 'exact': False, 'trials': trials, 'confidence': confidence, 'width': reached,
+            'converged': reached <= width, **distribution}
+
+def random_updates(Voting, procedure, X):
+    """
+    Finds the updates one of which update_ru or update_dru chooses at random in
+    the partial vector X: the calculable ballots of the unresolved agents at the
+    first preference level that has one, with direct votes first for DRU.
+    return: list of the agents and their calculated votes, empty when X is final
+    """
+    for level in sorted(Voting.ballots):
+        ballots = Voting.ballots[level]
+        direct, delegated = [], []
+
+        for agent in Voting.agents:
+            ballot = ballots[agent]
+            if X[agent] is not None or ballot is None:
+                continue
+            elif ballot.direct:
+                direct.append((agent, ballot.value))
+            else:
+                boolean, outcome = ballot.evaluate(X)
+                if boolean:
+                    delegated.append((agent, outcome))
+
+        if procedure == 'DRU' and direct:
+            return direct
+        if direct or delegated:
+            return direct + delegated
+
+    return []
+
+def exact_distribution(Voting, procedure='RU', max_states=100000, **sampling):
+    """
+    Computes the exact probability of every final vector X under a random unravelling
+    procedure. Every update fixes one agent, so the partial vectors are handled in
+    order of the number of resolved agents and the probability of every reachable
+    partial vector is computed once, however many orders of updates lead to it. The
+    preference level that is updated follows from the partial vector, so the partial
+    vector alone identifies a state.
+    When more than max_states partial vectors are reachable, the distribution is
+    estimated with outcome_distribution and the arguments in sampling instead.
+    return: dictionary like outcome_distribution, in which the lower and upper bound
+            equal the probability, and with the probability of every final vector X
+            under 'outcomes'
+    """
+    if procedure not in RANDOM_ALGORITHMS:
+        raise ValueError(f"Unknown random unravelling procedure '{procedure}', choose from {RANDOM_ALGORITHMS}")
+
+    agents = list(Voting.agents)
+    position = {agent: i for i, agent in enumerate(agents)}
+    layer = {(None,) * len(agents): 1.0}
+    outcomes = Counter()
+    states = 1
+
+    while layer:
+        next_layer = Counter()
+        for state, probability in layer.items():
+            X = dict(zip(agents, state))
+            updates = random_updates(Voting, procedure, X)
+
+            if not updates:
+                outcomes[state] += probability
+                continue
+
+            for agent, vote in updates:
+                i = position[agent]
+                next_layer[state[:i] + (vote,) + state[i + 1:]] += probability / len(updates)
+
+        states += len(next_layer)
+        if states > max_states:
+            result = outcome_distribution(Voting, procedure, **sampling)
+            result['states'] = states
+            return result
+        layer = next_layer
+
+    collective = Counter()
+    votes = {agent: Counter() for agent in agents}
+    for state, probability in outcomes.items():
+        collective[majority(state)] += probability
+        for agent, vote in zip(agents, state):
+            votes[agent][vote] += probability
+
+    exact = lambda probability: (float(probability),) * 3
+    return {'procedure': procedure, 'exact': True, 'states': states,
+            'collective': {decision: exact(collective[decision]) for decision in ['0', '1', 'tie']},
+            'votes': {agent: {vote: exact(count[vote]) for vote in sorted(count, key=str)} for agent, count in votes.items()},
+            'outcomes': {state: probability for state, probability in outcomes.items()}}
@@ -0,0 +1,131 @@
+"""
+DISCLAIMER: This file was created for the thesis of Romana Wilschut for the
+            bachelor ‘Artificial Intelligence’ at the University of Amsterdam.
+NAME:       Romana Wilschut
+UVA ID:     12156884
+INFO:       This file creates valid smart profiles of large electorates. Agents
+            only delegate to their neighbours in a social network, which is a
+            small-world, scale-free or community-structured graph, and every
+            delegation has a bounded number of agents. The time and memory are
+            linear in the number of agents.
+"""
+
+import random
+import numpy as np
+from create_data import create_delegations, write_profile
+from smartprofile import agent_names
+
+NETWORKS = ['small world', 'scale free', 'community']
+
+def small_world(number_of_agents, degree, rewiring):
+    """
+    Watts-Strogatz graph: every agent is linked to the degree nearest agents on a
+    ring, and every link is rewired to a random agent with probability rewiring.
+    return: array with shape (agents, degree) with the neighbours of every agent
+    """
+    agents = np.arange(number_of_agents)[:, None]
+    half = np.arange(1, degree // 2 + 1)
+    offsets = np.concatenate([half, -half, [degree // 2 + 1] * (degree % 2)]).astype(np.int64)
+    neighbours = (agents + offsets[None, :]) % number_of_agents
+
+    # A rewired link goes to any other agent
+    rewired = np.random.random_sample(neighbours.shape) < rewiring
+    targets = np.random.randint(0, number_of_agents - 1, size=neighbours.shape)
+    targets += targets >= agents
+    return np.where(rewired, targets, neighbours)
+
+def scale_free(number_of_agents, degree):
+    """
+    Barabási-Albert graph: every new agent is linked to degree // 2 earlier agents,
+    chosen with a probability proportional to their number of links.
+    return: list with the neighbours of every agent
+    """
+    links = max(1, degree // 2)
+    neighbours = [[] for _ in range(number_of_agents)]
+    # Every agent occurs once for each of its links, so a random entry is chosen preferentially
+    ends = list(range(min(links, number_of_agents)))
+
+    for agent in range(links, number_of_agents):
+        targets = set()
+        while len(targets) < links:
+            targets.add(ends[random.randrange(len(ends))])
+
+        for target in targets:
+            neighbours[agent].append(target)
+            neighbours[target].append(agent)
+            ends.append(target)
+        ends.extend([agent] * links)
+
+    return neighbours
+
+def community(number_of_agents, degree, communities, mixing):
+    """
+    Graph with communities of consecutive agents of about the same size. Every agent
+    is linked to degree agents of its own community, or with probability mixing to
+    an agent of the whole electorate.
+    return: array with shape (agents, degree) with the neighbours of every agent
+    """
+    communities = max(1, min(communities, number_of_agents))
+    size = -(-number_of_agents // communities)
+    agents = np.arange(number_of_agents)[:, None]
+    start = (agents // size) * size
+    members = np.minimum(start + size, number_of_agents) - start
+
+    inside = start + np.random.randint(0, 1 << 62, size=(number_of_agents, degree)) % members
+    outside = np.random.randint(0, number_of_agents, size=(number_of_agents, degree))
+    neighbours = np.where(np.random.random_sample((number_of_agents, degree)) < mixing, outside, inside)
+
+    # A link of an agent to itself is moved to the next agent
+    return np.where(neighbours == agents, (neighbours + 1) % number_of_agents, neighbours)
+
+def create_network(number_of_agents, network='small world', degree=8, rewiring=0.1, communities=10, mixing=0.05):
+    """
+    Creates the social network of an electorate.
+    return: list with the different neighbours of every agent
+    """
+    if network not in NETWORKS:
+        raise ValueError(f"Unknown network '{network}', choose from {NETWORKS}")
+    if number_of_agents < 2:
+        return [[] for _ in range(number_of_agents)]
+
+    # An agent has at most all other agents as neighbours
+    degree = min(degree, number_of_agents - 1)
+
+    if network == 'small world':
+        neighbours = small_world(number_of_agents, degree, rewiring).tolist()
+    elif network == 'scale free':
+        neighbours = scale_free(number_of_agents, degree)
+    else:
+        neighbours = community(number_of_agents, degree, communities, mixing).tolist()
+
+    # Links can occur twice after rewiring, only the first occurrence is kept, and agents never delegate to themselves
+    return [[neighbour for neighbour in dict.fromkeys(agent_neighbours) if neighbour != agent]
+            for agent, agent_neighbours in enumerate(neighbours)]
+
+def create_electorate(number_of_agents, maximal_delegations, delegation_bounds, profile, network='small world',
+                      degree=8, maximal_size=4, rewiring=0.1, communities=10, mixing=0.05):
+    """
+    Creates the delegation ballots of a valid smart profile of a large electorate, in
+    which agents only delegate to at most maximal_size of their neighbours at once.
+    return: for every agent the delegation ballot as a list of cells
+    """
+    names = agent_names(number_of_agents)
+    neighbours = create_network(number_of_agents, network, degree, rewiring, communities, mixing)
+    lower_bound, upper_bound = delegation_bounds[0], delegation_bounds[1]
+
+    return [create_delegations([names[neighbour] for neighbour in neighbours[i]], maximal_delegations,
+                               lower_bound, upper_bound, profile, maximal_size)
+            for i in range(number_of_agents)]
+
+def create_electorate_data(file, number_of_agents, maximal_delegations, delegation_bounds, profile, **network):
+    """
+    Creates a valid smart profile of a large electorate and writes it to a file.
+    """
+    write_profile(file, create_electorate(number_of_agents, maximal_delegations, delegation_bounds, profile, **network))
+
+if __name__ == "__main__":
+    # The parameters are given on the command line, see ‘python main.py electorate --help’
+    import sys
+    from main import main
+
+    main(['electorate'] + sys.argv[1:])
@@ -1,40 +1,288 @@
 """
-DISCLAIMER: This file was created for the thesis of Romana Wilschut for the 
+DISCLAIMER: This file was created for the thesis of Romana Wilschut for the
             bachelor ‘Artificial Intelligence’ at the University of Amsterdam.
-NAME:       Romana Wilschut 
+NAME:       Romana Wilschut
 UVA ID:     12156884
 INFO:       This files creates valid smart profiles according to the parameters.
             These are unravelled for each unravelling procedure, and the number
-            of cycles that arise are printed.
+            of cycles that arise are printed. The parameters are given on the
+            command line, see ‘python main.py --help’. Heavy modules are only
+            imported by the commands that need them.
 """
 
-from setup import SmartVoting, create_profile
-from create_data import create_data
+import argparse
+import sys
+
+# Modules that unravelling a profile does not need
+HEAVY_MODULES = ['pandas', 'networkx', 'sympy']
+
+def add_generation_arguments(parser):
+    """
+    Adds the parameters of the created valid smart profiles.
+    """
+    parser.add_argument('--agents', type=int, default=5, help="number of agents")
+    parser.add_argument('--delegations', type=int, default=4, help="maximal number of preference levels")
+    parser.add_argument('--lower', type=float, default=0, help="lower delegation bound, between 0 and 1")
+    parser.add_argument('--upper', type=float, default=1, help="upper delegation bound, between 0 and 1")
+    parser.add_argument('--type', default='no negation', choices=['combined', 'quota', 'logic', 'no negation'],
+                        help="type of the profiles")
+    parser.add_argument('--amount', type=int, default=10, help="number of profiles")
+    parser.add_argument('--seed', type=int, default=None, help="seed of the random generators")
+
+def add_cycle_arguments(parser):
+    """
+    Adds the parameters of the cycle metric, see CycleCounter.
+    """
+    parser.add_argument('--metric', default='exact', choices=['exact', 'length', 'scc'], help="cycle metric")
+    parser.add_argument('--max-cycles', type=int, default=None, help="stop counting after this number of cycles")
+    parser.add_argument('--time-budget', type=float, default=None, help="stop counting after this number of seconds")
+    parser.add_argument('--max-length', type=int, default=None, help="only count cycles up to this number of agents")
+    parser.add_argument('--procedures', nargs='+', default=None, choices=['U', 'DU', 'RU', 'DRU'],
+                        help="unravel only with these unravelling procedures")
+
+def unravel_profile(profile, args):
+    """
+    Unravels a profile and prints the outcome with the agent names.
+    return: the statistics of unravelling when asked for with --stats, otherwise None
+    """
+    from setup import SmartVoting
+
+    if getattr(args, 'decision_only', False):
+        decisions = SmartVoting(profile).decide(args.procedures, args.count_cycles, args.metric, args.max_cycles,
+                                                args.time_budget, args.max_length)
+        print("\nCollective decision per unravelling procedure\n", decisions, "\n")
+        return None
+
+    stats = getattr(args, 'stats', False)
+    output = SmartVoting(profile).unravel(cycle_metric=args.metric, max_cycles=args.max_cycles,
+                                          time_budget=args.time_budget, max_length=args.max_length, stats=stats,
+                                          procedures=args.procedures)
+    outcome, number_of_cycles = output[:2]
+    outcome = {algorithm: profile.named(X) for algorithm, X in outcome.items()}
+
+    print("\nFinal collective decision\n", outcome, "\n")
+    print("Cycles per unravelling procedure\n", number_of_cycles, "\n")
+
+    return output[2] if stats else None
+
+def create(args):
+    """
+    Creates valid smart profiles, writes them to files in the folder and unravels them.
+    """
+    import os
+    import random
+    import numpy as np
+    from create_data import create_rows, write_profile
+    from smartprofile import SmartProfile
+
+    if args.seed is not None:
+        random.seed(args.seed)
+        np.random.seed(args.seed)
+
+    for i in range(1, args.amount + 1):
+        file = f"{i}_{args.agents}_{args.delegations}_{args.lower:g}_{args.upper:g}.csv"
+        rows = create_rows(args.agents, args.delegations, [args.lower, args.upper], args.type)
+        write_profile(os.path.join(args.folder, file), rows)
+        profile = SmartProfile(rows)
+
+        print("Valid smart profile")
+        for name, row in zip(profile.names, rows):
+            print(name, ', '.join(row))
+
+        unravel_profile(profile, args)
+
+def unravel(args):
+    """
+    Unravels profile files of create_data and binary profile stores.
+    """
+    from smartprofile import SmartProfile
+
+    stats = []
+    for file in args.files:
+        if file.endswith('.csv'):
+            print(file)
+            stats.append(unravel_profile(SmartProfile.read(file), args))
+        else:
+            from store import ProfileStore
+
+            for i, profile in enumerate(ProfileStore(file)):
+                print(f"{file}[{i}]")
+                stats.append(unravel_profile(profile, args))
+
+    if args.stats and not args.decision_only:
+        print("Statistics per unravelling procedure")
+        for algorithm, counters in sum(stats).as_dict().items():
+            print(algorithm, counters)
+
+def experiment(args):
+    """
+    Creates and unravels the profiles over a pool of workers and prints a summary.
+    """
+    from runner import run_experiment, summarise
+
+    results = run_experiment(args.agents, args.delegations, [args.lower, args.upper], args.type, args.amount,
+                             seed=args.seed or 0, workers=args.workers, chunksize=args.chunksize, folder=args.folder)
+
+    for algorithm, summary in summarise(results).items():
+        print(algorithm, summary)
+
+def electorate(args):
+    """
+    Creates valid smart profiles of large electorates on a social network and writes them to files in the folder.
+    """
+    import os
+    import random
+    import numpy as np
+    from electorate import create_electorate_data
+
+    if args.seed is not None:
+        random.seed(args.seed)
+        np.random.seed(args.seed)
+
+    for i in range(1, args.amount + 1):
+        file = f"{i}_{args.agents}_{args.delegations}_{args.lower:g}_{args.upper:g}_{args.network.replace(' ', '_')}.csv"
+        create_electorate_data(os.path.join(args.folder, file), args.agents, args.delegations, [args.lower, args.upper],
+                               args.type, network=args.network, degree=args.degree, maximal_size=args.maximal_size,
+                               rewiring=args.rewiring, communities=args.communities, mixing=args.mixing)
+        print(file)
+
+def distribution(args):
+    """
+    Estimates the distribution of the outcome of a random unravelling procedure for a profile file.
+    """
+    from distribution import exact_distribution, outcome_distribution
+    from setup import SmartVoting
+    from smartprofile import SmartProfile
+
+    profile = SmartProfile.read(args.file)
+    sampling = {'width': args.width, 'confidence': args.confidence, 'max_trials': args.max_trials,
+                'seed': args.seed, 'workers': args.workers}
+    if args.exact:
+        estimate = exact_distribution(SmartVoting(profile), args.procedure, args.max_states, **sampling)
+    else:
+        estimate = outcome_distribution(SmartVoting(profile), args.procedure, **sampling)
+
+    if estimate['exact']:
+        print(f"Exact distribution over {estimate['states']} partial vote vectors")
+    else:
+        print(f"{estimate['trials']} trials, widest interval {estimate['width']:.4f}, converged: {estimate['converged']}")
+    print("Collective decision\n", estimate['collective'])
+    print("Final votes\n", profile.named(estimate['votes']))
+
+def import_check(file):
+    """
+    Unravels a profile file in a new interpreter.
+    return: the seconds from a cold start until the profile is unravelled, and the
+            heavy modules that were imported
+    """
+    import os
+    import subprocess
+
+    code = (
+        "import sys, time\n"
+        f"sys.path.insert(0, {os.path.dirname(os.path.abspath(__file__))!r})\n"
+        "start = time.perf_counter()\n"
+        "from setup import SmartVoting\n"
+        "from smartprofile import SmartProfile\n"
+        f"SmartVoting(SmartProfile.read({file!r})).unravel()\n"
+        "print(time.perf_counter() - start)\n"
+        f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))\n"
+    )
+    output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True).stdout.split('\n')
+
+    return float(output[0]), [module for module in output[1].split(',') if module]
+
+def imports(args):
+    """
+    Checks in a new interpreter that unravelling a profile file stays within the
+    import time budget and does not import any of the heavy modules. Without a
+    file, a profile is created for the check.
+    """
+    import os
+    import random
+    import tempfile
+    from create_data import create_rows, write_profile
+
+    with tempfile.TemporaryDirectory() as folder:
+        file = args.file
+        if file is None:
+            state = random.getstate()
+            random.seed(0)
+            file = os.path.join(folder, 'profile.csv')
+            write_profile(file, create_rows(10, 4, [0, 1], 'combined'))
+            random.setstate(state)
+
+        seconds, loaded = import_check(file)
+
+    print(f"Unravelled {args.file or 'a created profile'} in {seconds:.3f}s from a cold start (budget {args.budget}s)")
+    if loaded:
+        sys.exit(f"Heavy modules were imported: {', '.join(loaded)}")
+    if seconds > args.budget:
+        sys.exit("Import time budget exceeded")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Create and unravel valid smart profiles.")
+    commands = parser.add_subparsers(dest='command')
+
+    create_parser = commands.add_parser('create', help="create, store and unravel profiles (default)")
+    add_generation_arguments(create_parser)
+    add_cycle_arguments(create_parser)
+    create_parser.add_argument('--folder', default='.', help="folder of the profile files")
+    create_parser.set_defaults(function=create)
+
+    unravel_parser = commands.add_parser('unravel', help="unravel profile files or a profile store")
+    unravel_parser.add_argument('files', nargs='+')
+    add_cycle_arguments(unravel_parser)
+    unravel_parser.add_argument('--stats', action='store_true', help="count and time the internals of unravelling")
+    unravel_parser.add_argument('--decision-only', action='store_true',
+                                help="stop unravelling as soon as the collective decision is known")
+    unravel_parser.add_argument('--count-cycles', action='store_true',
+                                help="also count the cycles with --decision-only, which are not counted otherwise")
+    unravel_parser.set_defaults(function=unravel)
+
+    experiment_parser = commands.add_parser('experiment', help="create and unravel profiles over a pool of workers")
+    add_generation_arguments(experiment_parser)
+    experiment_parser.add_argument('--workers', type=int, default=None, help="number of processes, 0 for none")
+    experiment_parser.add_argument('--chunksize', type=int, default=16, help="profiles per task")
+    experiment_parser.add_argument('--folder', default=None, help="also store the profiles in this folder")
+    experiment_parser.set_defaults(function=experiment)
+
+    electorate_parser = commands.add_parser('electorate', help="create profiles of large electorates on a social network")
+    add_generation_arguments(electorate_parser)
+    electorate_parser.add_argument('--network', default='small world', choices=['small world', 'scale free', 'community'])
+    electorate_parser.add_argument('--degree', type=int, default=8, help="average number of neighbours of an agent")
+    electorate_parser.add_argument('--maximal-size', type=int, default=4, help="largest number of agents in a delegation")
+    electorate_parser.add_argument('--rewiring', type=float, default=0.1, help="rewiring probability of a small world")
+    electorate_parser.add_argument('--communities', type=int, default=10, help="number of communities")
+    electorate_parser.add_argument('--mixing', type=float, default=0.05, help="probability of a link between communities")
+    electorate_parser.add_argument('--folder', default='.', help="folder of the profile files")
+    electorate_parser.set_defaults(function=electorate, agents=10000, type='combined', amount=1, seed=0)
+
+    distribution_parser = commands.add_parser('distribution', help="estimate the outcome distribution of RU or DRU")
+    distribution_parser.add_argument('file')
+    distribution_parser.add_argument('--procedure', default='RU', choices=['RU', 'DRU'])
+    distribution_parser.add_argument('--width', type=float, default=0.02, help="width of the confidence intervals")
+    distribution_parser.add_argument('--confidence', type=float, default=0.95, help="confidence level of the intervals")
+    distribution_parser.add_argument('--max-trials', type=int, default=100000, help="stop after this number of trials")
+    distribution_parser.add_argument('--seed', type=int, default=0)
+    distribution_parser.add_argument('--workers', type=int, default=0, help="number of processes, 0 for none")
+    distribution_parser.add_argument('--exact', action='store_true', help="compute the distribution exactly")
+    distribution_parser.add_argument('--max-states', type=int, default=100000,
+                                     help="sample instead when more partial vote vectors are reachable")
+    distribution_parser.set_defaults(function=distribution)
+
+    imports_parser = commands.add_parser('imports', help="check the import time of unravelling a profile file")
+    imports_parser.add_argument('file', nargs='?', default=None, help="profile file, a profile is created without it")
+    imports_parser.add_argument('--budget', type=float, default=1.0, help="import time budget in seconds")
+    imports_parser.set_defaults(function=imports)
+
+    # Without a command, the profiles are created as before
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv or argv[0].startswith('-') and argv[0] not in ('-h', '--help'):
+        argv = ['create'] + argv
+
+    args = parser.parse_args(argv)
+    args.function(args)
 
 if __name__ == "__main__":
-    ########## CHANGE PARAMETERS ##########
-    maximal_delegations = 4 
-    number_of_agents = 5
-    delegation_bound_lower = 0 # value between 0 and 1
-    delegation_bound_upper = 1 # value between 0 and 1
-    type_of_profile = 'no negation' # can be 'combined', 'quota', 'logic' or 'no negation'
-    amount_profiles = 10
-    #######################################
-
-    for i in range(1, amount_profiles + 1):
-        file = f"{i}_{number_of_agents}_{maximal_delegations}_{delegation_bound_lower}_{delegation_bound_upper}.csv"
-
-        ########## CHANGE PATH TO DESIRED FOLDER ##########
-        create_data(f"{file}", number_of_agents, maximal_delegations, [delegation_bound_lower, delegation_bound_upper], type_of_profile)
-        profile, agents = create_profile(f"{file}", number_of_agents, maximal_delegations)
-        ###################################################
-        print("Valid smart profile\n", profile)
-
-        # Create smart voting model
-        Voting = SmartVoting(profile, agents)
-        # Unravel the profile
-        outcome, number_of_cycles = Voting.unravel()
-
-        print("\nFinal collective decision\n", outcome, "\n")
-        print("Cycles per unravelling procedure\n", number_of_cycles, "\n")
-        
\ No newline at end of file
+    main()
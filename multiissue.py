@@ -0,0 +1,159 @@
+"""
+DISCLAIMER: This file was created for the thesis of Romana Wilschut for the
+            bachelor ‘Artificial Intelligence’ at the University of Amsterdam.
+NAME:       Romana Wilschut
+UVA ID:     12156884
+INFO:       This file consists of a smart voting model for many binary issues
+            with the same delegations. The votes of an agent on up to 64 issues
+            are kept in two bitmasks, the issues of which the vote is known and
+            the issues of which the vote is '1', so every ballot is evaluated for
+            all issues at once with bitwise operations.
+"""
+
+from smartprofile import SmartProfile
+
+MAXIMAL_ISSUES = 64
+ALGORITHMS = ['U', 'DU']
+
+def structure(ballot):
+    """
+    return: what a compiled delegation ballot consists of, to compare ballots of different profiles
+    """
+    if ballot is None:
+        return None
+
+    return type(ballot).__name__, ballot.agents, getattr(ballot, 'quota', None), getattr(ballot, 'conjunctions', None)
+
+class MultiIssueVoting:
+    def __init__(self, profiles):
+        """
+        Initialise values. The profiles are SmartProfiles, one per issue, which only
+        differ in the direct votes: every cell that is a direct vote in one issue is
+        a direct vote in all issues, and the other cells are the same.
+        """
+        if not 0 < len(profiles) <= MAXIMAL_ISSUES:
+            raise ValueError(f"Give between 1 and {MAXIMAL_ISSUES} issues, not {len(profiles)}")
+
+        first = profiles[0]
+        self.profiles = profiles
+        self.agents = first.agents
+        self.names = first.names
+        self.levels = sorted(first.ballots)
+        self.issues = (1 << len(profiles)) - 1     # Mask of all issues
+
+        # Delegation ballots per preference level, shared by all issues
+        self.ballots = first.ballots
+        # For every direct vote per preference level the mask of the issues in which it is '1'
+        self.direct = {level: {} for level in self.levels}
+
+        for profile in profiles:
+            if len(profile.agents) != len(self.agents) or sorted(profile.ballots) != self.levels:
+                raise ValueError("The profiles of the issues have different agents or preference levels")
+
+        for level in self.levels:
+            for agent in self.agents:
+                ballot = self.ballots[level][agent]
+                cells = [profile.ballots[level][agent] for profile in profiles]
+
+                if ballot is None or not ballot.direct:
+                    if any(structure(cell) != structure(ballot) for cell in cells):
+                        raise ValueError(f"The delegation of agent {self.names[agent]} at preference level "
+                                         f"{level} differs between the issues")
+                    continue
+
+                if any(cell is None or not cell.direct for cell in cells):
+                    raise ValueError(f"Agent {self.names[agent]} does not vote directly at preference level "
+                                     f"{level} in every issue")
+                self.direct[level][agent] = sum(1 << i for i, cell in enumerate(cells) if cell.value == '1')
+
+    @classmethod
+    def from_rows(cls, rows_of_issues, names=None):
+        """
+        Creates the model from the delegation ballots of every issue as lists of cells.
+        """
+        return cls([SmartProfile(rows, names) for rows in rows_of_issues])
+
+    def unravel(self, procedures=None):
+        """
+        Unravels all issues at once with the unravelling procedures U and DU, or only
+        with the procedures in the list procedures. Cycles are not counted.
+        return: for each unravelling procedure the final vector X of every issue
+        """
+        algorithms = list(ALGORITHMS) if procedures is None else list(procedures)
+        if not algorithms or any(algorithm not in ALGORITHMS for algorithm in algorithms):
+            raise ValueError(f"Choose the unravelling procedures from {ALGORITHMS}, not {procedures}")
+
+        result = {}
+        for algorithm in algorithms:
+            known, ones = self.unravel_issues(algorithm)
+            result[algorithm] = [self.vector(known, ones, i) for i in range(len(self.profiles))]
+
+        return result
+
+    def unravel_issues(self, procedure):
+        """
+        Unravels all issues with U or DU. In every round, each issue is updated at its
+        own first preference level with a calculable ballot, and all updates of a round
+        are calculated from the votes before the round.
+        return: for every agent the mask of the issues with a known vote and the mask
+                of the issues with vote '1'
+        """
+        known = [0] * len(self.agents)
+        ones = [0] * len(self.agents)
+        unresolved = list(self.agents)
+
+        while unresolved:
+            updates = []
+            # Issues that are updated at an earlier preference level in this round
+            taken = 0
+
+            for level in self.levels:
+                direct_updates, delegated_updates = [], []
+                direct_issues, delegated_issues = 0, 0
+
+                for agent in unresolved:
+                    ballot = self.ballots[level][agent]
+                    unknown = self.issues & ~known[agent] & ~taken
+                    if ballot is None or not unknown:
+                        continue
+
+                    if ballot.direct:
+                        direct_updates.append((agent, unknown, self.direct[level][agent] & unknown))
+                        direct_issues |= unknown
+                    else:
+                        calculable, outcome = ballot.evaluate_issues(known, ones, self.issues)
+                        if calculable & unknown:
+                            delegated_updates.append((agent, calculable & unknown, outcome & unknown))
+                            delegated_issues |= calculable & unknown
+
+                # With DU, issues with a direct vote at this level only update the direct votes
+                if procedure == 'DU':
+                    delegated_issues &= ~direct_issues
+                elif procedure != 'U':
+                    raise ValueError(f"Unknown unravelling procedure '{procedure}'")
+
+                updates += direct_updates
+                updates += [(agent, issues & delegated_issues, outcome & delegated_issues)
+                            for agent, issues, outcome in delegated_updates if issues & delegated_issues]
+                taken |= direct_issues | delegated_issues
+
+                if taken == self.issues:
+                    break
+
+            if not taken:
+                break
+
+            # All updates are calculated before any of them is fixed
+            for agent, issues, outcome in updates:
+                known[agent] |= issues
+                ones[agent] |= outcome
+            unresolved = [agent for agent in unresolved if known[agent] != self.issues]
+
+        return known, ones
+
+    def vector(self, known, ones, issue):
+        """
+        return: the final vector X of an issue
+        """
+        bit = 1 << issue
+        return {agent: ('1' if ones[agent] & bit else '0') if known[agent] & bit else None for agent in self.agents}
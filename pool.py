@@ -0,0 +1,167 @@
+"""
+DISCLAIMER: This file was created for the thesis of Romana Wilschut for the
+            bachelor ‘Artificial Intelligence’ at the University of Amsterdam.
+NAME:       Romana Wilschut
+UVA ID:     12156884
+INFO:       This file consists of a pool of interned delegation ballots and of a
+            collection of smart profiles that refer to it. Every distinct cell is
+            stored and compiled once, and a profile only keeps an integer reference
+            to the pool for each of its cells.
+"""
+
+import sys
+from array import array
+from ballots import compile_ballot
+from smartprofile import SmartProfile
+
+EMPTY = 0       # Reference of an empty cell
+
+class AgentIndex(dict):
+    """
+    Agent id of every agent name of agent_names, for electorates of any size:
+    single letters for up to 26 agents and a letter with a number otherwise.
+    """
+    def __missing__(self, name):
+        agent = ord(name) - ord('A') if len(name) == 1 else int(name[1:])
+        self[name] = agent
+        return agent
+
+class BallotPool:
+    def __init__(self, index=None):
+        """
+        Empty pool of delegation ballots. Cells are compiled with the agent ids of
+        index, the agent ids of agent_names by default.
+        """
+        self.index = AgentIndex() if index is None else index
+        self.references = {'': EMPTY, '-': EMPTY}
+        self.cells = ['']
+        self.ballots = [None]
+
+    def __len__(self):
+        return len(self.cells)
+
+    def intern(self, cell):
+        """
+        Adds a cell to the pool when it is not in the pool yet.
+        return: the reference of the cell
+        """
+        reference = self.references.get(cell)
+        if reference is None:
+            cell = sys.intern(cell)
+            reference = self.references[cell] = len(self.cells)
+            self.cells.append(cell)
+            self.ballots.append(compile_ballot(cell, self.index))
+
+        return reference
+
+    def memory(self):
+        """
+        return: estimate of the bytes used by the cells, the compiled ballots and the references
+        """
+        cells = sys.getsizeof(self.cells) + sum(sys.getsizeof(cell) for cell in self.cells)
+        # Direct votes are shared by all pools, so they are not counted
+        ballots = sys.getsizeof(self.ballots) + sum(ballot_size(ballot) for ballot in self.ballots
+                                                    if ballot is not None and not ballot.direct)
+        references = sys.getsizeof(self.references)
+
+        return {'cells': cells, 'ballots': ballots, 'references': references, 'total': cells + ballots + references}
+
+def ballot_size(value):
+    """
+    return: estimate of the bytes of a compiled ballot and the containers it refers to,
+            small integers and strings are shared and not counted
+    """
+    size = sys.getsizeof(value)
+
+    if isinstance(value, (tuple, list, set, frozenset)):
+        size += sum(ballot_size(item) for item in value if isinstance(item, (tuple, list, set, frozenset, dict)))
+    elif isinstance(value, dict):
+        size += sum(ballot_size(item) for item in value.values() if isinstance(item, (tuple, list, dict)))
+    elif hasattr(type(value), '__slots__'):
+        size += sum(ballot_size(getattr(value, name)) for name in type(value).__slots__
+                    if isinstance(getattr(value, name, None), (tuple, list, set, frozenset, dict)))
+
+    return size
+
+class ProfileCollection:
+    def __init__(self, pool=None):
+        """
+        Empty collection of smart profiles of which the cells are kept in a shared
+        pool. The references of all profiles are stored after each other in a
+        single array, so a profile costs a few bytes per cell.
+        """
+        self.pool = BallotPool() if pool is None else pool
+        self.cells = array('I')
+        self.offsets = array('Q')
+        self.agents = array('I')
+        self.levels = array('H')
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def add(self, rows):
+        """
+        Adds a smart profile, given as the delegation ballot of every agent as a list of cells.
+        return: the index of the profile in the collection
+        """
+        levels = max((len(row) for row in rows), default=0)
+
+        self.offsets.append(len(self.cells))
+        self.agents.append(len(rows))
+        self.levels.append(levels)
+        for row in rows:
+            self.cells.extend([self.pool.intern(cell.strip()) for cell in row])
+            self.cells.extend([EMPTY] * (levels - len(row)))
+
+        return len(self) - 1
+
+    def add_dataframe(self, dataframe):
+        """
+        Adds the smart profile of a dataframe of create_profile.
+        return: the index of the profile in the collection
+        """
+        return self.add([[dataframe[level][name] for level in dataframe.columns] for name in dataframe.index])
+
+    def references(self, i):
+        """
+        return: for every agent of profile i the references of its cells
+        """
+        offset, agents, levels = self.offsets[i], self.agents[i], self.levels[i]
+        return [self.cells[offset + agent * levels:offset + (agent + 1) * levels] for agent in range(agents)]
+
+    def rows(self, i):
+        """
+        return: for every agent of profile i the delegation ballot as a list of cells
+        """
+        return [[self.pool.cells[reference] for reference in row if reference != EMPTY] for row in self.references(i)]
+
+    def __getitem__(self, i):
+        """
+        return: profile i as SmartProfile, with the compiled ballots of the pool
+        """
+        ballots = self.pool.ballots
+        ballot_rows = []
+        for row in self.references(i):
+            # Trailing empty cells are not part of the ballot
+            length = len(row)
+            while length and row[length - 1] == EMPTY:
+                length -= 1
+            ballot_rows.append([ballots[reference] for reference in row[:length]])
+
+        return SmartProfile.from_ballots(ballot_rows)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def memory(self):
+        """
+        return: estimate of the bytes used by the pool and the references of the profiles,
+                with the number of profiles, cells and distinct cells
+        """
+        pool = self.pool.memory()
+        references = sum(sys.getsizeof(buffer) for buffer in [self.cells, self.offsets, self.agents, self.levels])
+
+        return {'profiles': len(self), 'cells': len(self.cells), 'distinct cells': len(self.pool),
+                'pool': pool['total'], 'profile references': references, 'total': pool['total'] + references,
+                'bytes per profile': (pool['total'] + references) / max(len(self), 1)}
@@ -0,0 +1,109 @@
+"""
+DISCLAIMER: This file was created for the thesis of Romana Wilschut for the
+            bachelor ‘Artificial Intelligence’ at the University of Amsterdam.
+NAME:       Romana Wilschut
+UVA ID:     12156884
+INFO:       This file runs an experiment over a pool of processes. Every profile
+            is a task with its own seed, so the results are the same for any
+            number of workers.
+"""
+
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+from create_data import create_rows, write_profile
+from setup import SmartVoting, majority
+from smartprofile import SmartProfile
+
+ALGORITHMS = ['U', 'DU', 'RU', 'DRU']
+
+def task_seeds(seed, amount_profiles):
+    """
+    Creates an independent seed for every profile from a single seed.
+    return: list of seeds
+    """
+    return [int(s.generate_state(1)[0]) for s in np.random.SeedSequence(seed).spawn(amount_profiles)]
+
+def run_task(i, seed, folder, number_of_agents, maximal_delegations, delegation_bounds, type_of_profile):
+    """
+    Creates and unravels a single valid smart profile with its own seed.
+    return: the index of the profile, the final votes and the number of cycles
+            for each unravelling procedure
+    """
+    random.seed(seed)
+    np.random.seed(seed)
+
+    rows = create_rows(number_of_agents, maximal_delegations, delegation_bounds, type_of_profile)
+    if folder is not None:
+        file = f"{i}_{number_of_agents}_{maximal_delegations}_{delegation_bounds[0]}_{delegation_bounds[1]}.csv"
+        write_profile(os.path.join(folder, file), rows)
+    profile = SmartProfile(rows)
+
+    outcome, number_of_cycles = SmartVoting(profile).unravel()
+    outcome = {algorithm: ''.join(outcome[algorithm][agent] for agent in profile.agents) for algorithm in ALGORITHMS}
+    number_of_cycles = {algorithm: number_of_cycles[algorithm] for algorithm in ALGORITHMS}
+
+    return i, outcome, number_of_cycles
+
+def run_chunk(tasks, folder, *parameters):
+    """
+    Runs a chunk of tasks in a worker.
+    return: list with the result of every task
+    """
+    return [run_task(i, seed, folder, *parameters) for i, seed in tasks]
+
+def run_experiment(number_of_agents, maximal_delegations, delegation_bounds, type_of_profile,
+                   amount_profiles, seed=0, workers=None, chunksize=16, folder=None):
+    """
+    Creates and unravels amount_profiles valid smart profiles over a pool of workers.
+    The final votes are returned as a string with the vote of every agent.
+    workers: number of processes, None for one per core and 0 to run in this process
+    folder: where the profiles are stored, None to keep them in memory only
+    return: list with for every profile the final votes and the number of cycles
+            for each unravelling procedure
+    """
+    parameters = (number_of_agents, maximal_delegations, delegation_bounds, type_of_profile)
+    tasks = list(enumerate(task_seeds(seed, amount_profiles), start=1))
+    chunks = [tasks[k:k + chunksize] for k in range(0, len(tasks), chunksize)]
+    results = [None] * amount_profiles
+
+    if workers == 0:
+        for chunk in chunks:
+            for i, outcome, number_of_cycles in run_chunk(chunk, folder, *parameters):
+                results[i - 1] = (outcome, number_of_cycles)
+        return results
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(run_chunk, chunk, folder, *parameters) for chunk in chunks]
+        for future in as_completed(futures):
+            for i, outcome, number_of_cycles in future.result():
+                results[i - 1] = (outcome, number_of_cycles)
+
+    return results
+
+def summarise(results):
+    """
+    Aggregates the results of an experiment.
+    return: for each unravelling procedure the total and mean number of cycles and
+            how often each collective decision occurred
+    """
+    summary = {}
+
+    for algorithm in ALGORITHMS:
+        cycles = [number_of_cycles[algorithm] for _, number_of_cycles in results]
+        decisions = {'0': 0, '1': 0, 'tie': 0}
+        for outcome, _ in results:
+            decisions[majority(outcome[algorithm])] += 1
+
+        summary[algorithm] = {'cycles': sum(cycles), 'mean cycles': sum(cycles) / max(len(cycles), 1),
+                              'decisions': decisions}
+
+    return summary
+
+if __name__ == "__main__":
+    # The parameters are given on the command line, see ‘python main.py experiment --help’
+    import sys
+    from main import main
+
+    main(['experiment'] + sys.argv[1:])
@@ -0,0 +1,367 @@
+"""
+DISCLAIMER: This file was created for the thesis of Romana Wilschut for the
+            bachelor ‘Artificial Intelligence’ at the University of Amsterdam.
+NAME:       Romana Wilschut
+UVA ID:     12156884
+INFO:       This file consists of a local HTTP service that unravels smart
+            profiles. Concurrent requests are collected in batches, which are
+            unravelled by a pool of processes that have imported the model
+            beforehand. Requests are refused when too many are waiting.
+"""
+
+import argparse
+import asyncio
+import ipaddress
+import json
+import multiprocessing
+import os
+import socket
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+MAXIMAL_BODY = 1 << 20      # Largest request body in bytes
+
+# Bounds of the cycle count of a request, so a dense profile cannot occupy a worker
+MAXIMAL_CYCLES = 100000
+TIME_BUDGET = 0.25          # Seconds per unravelling procedure, so one second for all four
+
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+           413: 'Payload Too Large', 503: 'Service Unavailable'}
+
+WARM_UP_TIMEOUT = 60       # Seconds for all workers to start
+
+# Barrier of the warm-up tasks in a worker process
+worker_barrier = None
+
+def start_worker(barrier):
+    """
+    Imports the model in a worker process and unravels a small profile, so the
+    first batch does not wait for it.
+    """
+    global worker_barrier
+    worker_barrier = barrier
+    unravel_profiles([{'profile': "B, 1\nA, 0"}])
+
+def warm_up():
+    """
+    Warm-up task of which every worker runs one: a worker waits until all workers
+    have started, so no worker takes the task of another.
+    """
+    worker_barrier.wait(WARM_UP_TIMEOUT)
+
+def parse_profile(text):
+    """
+    Reads a smart profile in the syntax of the files of create_data, with the
+    delegation ballot of an agent on every line and the cells separated by ', '.
+    return: for every agent the delegation ballot as a list of cells
+    """
+    return [line.strip().split(', ') for line in text.strip().split('\n') if line.strip()]
+
+def bound(value, maximum):
+    """
+    return: the bound of a request, which is at most maximum
+    """
+    return maximum if value is None else min(value, maximum)
+
+def unravel_profiles(requests):
+    """
+    Unravels a batch of requests in a worker. A request has the profile as text and
+    optionally the cycle metric and its bounds, see SmartVoting.unravel. The cycles
+    are counted up to at most MAXIMAL_CYCLES cycles and TIME_BUDGET seconds.
+    return: list with for every request the final votes per unravelling procedure with
+            the agent names and the number of cycles, or the error
+    """
+    from setup import SmartVoting
+    from smartprofile import SmartProfile
+
+    responses = []
+    for request in requests:
+        try:
+            rows = parse_profile(request['profile'])
+            names = request.get('names')
+            if names is not None and len(names) != len(rows):
+                raise ValueError(f"{len(names)} names for {len(rows)} agents")
+            profile = SmartProfile(rows, names)
+        except KeyError as error:
+            responses.append({'error': f"Invalid profile: unknown agent {error}"})
+            continue
+        except (ValueError, IndexError, TypeError) as error:
+            # Cells that are not a vote, a quota rule or a formula in disjunctive normal form are refused
+            responses.append({'error': f"Invalid profile: {error}"})
+            continue
+
+        try:
+            outcome, number_of_cycles = SmartVoting(profile).unravel(
+                cycle_metric=request.get('metric', 'exact'), max_cycles=bound(request.get('max_cycles'), MAXIMAL_CYCLES),
+                time_budget=bound(request.get('time_budget'), TIME_BUDGET), max_length=request.get('max_length'))
+
+            responses.append({'outcome': {algorithm: profile.named(X) for algorithm, X in outcome.items()},
+                              'cycles': number_of_cycles})
+        except Exception as error:
+            responses.append({'error': f"{type(error).__name__}: {error}"})
+
+    return responses
+
+class Batcher:
+    def __init__(self, workers=None, batch_size=32, delay=0.005, queue_limit=1024, in_flight=None):
+        """
+        Collects requests in batches of at most batch_size, waiting at most delay seconds
+        after the first request of a batch. At most queue_limit requests wait, and at most
+        in_flight batches are unravelled at once, two per worker by default.
+        """
+        self.workers = workers or os.cpu_count()
+        context = multiprocessing.get_context()
+        self.executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=context, initializer=start_worker,
+                                            initargs=(context.Barrier(self.workers),))
+        self.batch_size = batch_size
+        self.delay = delay
+        self.queue = asyncio.Queue(maxsize=queue_limit)
+        self.slots = asyncio.Semaphore(in_flight or 2 * self.workers)
+        self.counts = {'served': 0, 'refused': 0, 'batches': 0}
+        self.dispatcher = None
+
+    async def start(self):
+        """
+        Starts every worker and waits until all of them are warm, since the pool only
+        starts a worker when a task is submitted.
+        """
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(loop.run_in_executor(self.executor, warm_up) for _ in range(self.workers)))
+        self.dispatcher = loop.create_task(self.dispatch())
+
+    async def close(self):
+        if self.dispatcher is not None:
+            self.dispatcher.cancel()
+        self.executor.shutdown(cancel_futures=True)
+
+    def submit(self, request):
+        """
+        Adds a request to the queue, or refuses it when the queue is full.
+        return: future of the response, None when the request is refused
+        """
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self.queue.put_nowait((request, future))
+        except asyncio.QueueFull:
+            self.counts['refused'] += 1
+            return None
+
+        return future
+
+    async def dispatch(self):
+        """
+        Takes batches from the queue and sends them to the workers, while the
+        number of batches that are unravelled stays within the limit.
+        """
+        loop = asyncio.get_running_loop()
+
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.delay
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), max(0, deadline - loop.time())))
+                except asyncio.TimeoutError:
+                    break
+
+            await self.slots.acquire()
+            self.counts['batches'] += 1
+            loop.create_task(self.run(batch))
+
+    async def run(self, batch):
+        try:
+            requests = [request for request, _ in batch]
+            responses = await asyncio.get_running_loop().run_in_executor(self.executor, unravel_profiles, requests)
+            for (_, future), response in zip(batch, responses):
+                if not future.done():
+                    future.set_result(response)
+            self.counts['served'] += len(batch)
+        except Exception as error:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(error)
+        finally:
+            self.slots.release()
+
+    def health(self):
+        return dict(self.counts, queued=self.queue.qsize(), workers=self.workers)
+
+async def read_request(reader):
+    """
+    Reads an HTTP request.
+    return: the method, path, headers and body, or None when the connection is closed
+    """
+    line = await reader.readline()
+    if not line:
+        return None
+
+    method, path, _ = line.decode('latin-1').split(' ', 2)
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, value = line.decode('latin-1').split(':', 1)
+        headers[name.strip().lower()] = value.strip()
+
+    length = int(headers.get('content-length', 0))
+    if length > MAXIMAL_BODY:
+        return method, path, headers, None
+
+    body = await reader.readexactly(length) if length else b''
+    return method, path, headers, body
+
+def write_response(writer, status, content, keep_alive=True):
+    body = json.dumps(content).encode()
+    head = (f"HTTP/1.1 {status} {REASONS[status]}\r\nContent-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\nConnection: {'keep-alive' if keep_alive else 'close'}\r\n")
+    if status == 503:
+        head += "Retry-After: 1\r\n"
+    writer.write(head.encode() + b"\r\n" + body)
+
+async def respond(batcher, method, path, body):
+    """
+    return: the status and content of the response to a request
+    """
+    if path == '/health':
+        return 200, batcher.health()
+    if path != '/unravel':
+        return 404, {'error': f"Unknown path {path}"}
+    if method != 'POST':
+        return 405, {'error': "Use POST with a JSON body"}
+    if body is None:
+        return 413, {'error': f"The body is larger than {MAXIMAL_BODY} bytes"}
+
+    try:
+        request = json.loads(body)
+        if not isinstance(request.get('profile'), str):
+            raise ValueError("'profile' is missing")
+    except (ValueError, AttributeError) as error:
+        return 400, {'error': f"Expected a JSON object with the profile as text under 'profile': {error}"}
+
+    future = batcher.submit(request)
+    if future is None:
+        return 503, {'error': "Too many requests are waiting"}
+
+    response = await future
+    return (400 if 'error' in response else 200), response
+
+def serve(batcher):
+    async def handle(reader, writer):
+        try:
+            while True:
+                request = await read_request(reader)
+                if request is None:
+                    break
+
+                method, path, headers, body = request
+                status, content = await respond(batcher, method, path, body)
+                keep_alive = headers.get('connection', '').lower() != 'close' and body is not None
+                write_response(writer, status, content, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    return handle
+
+async def run_service(host='127.0.0.1', port=8000, **options):
+    """
+    Runs the service until it is cancelled. Only loopback addresses are accepted.
+    """
+    if not ipaddress.ip_address(socket.gethostbyname(host)).is_loopback:
+        raise ValueError(f"The service only runs on localhost, not on {host}")
+
+    batcher = Batcher(**options)
+    try:
+        # The socket is only opened when all workers are warm
+        await batcher.start()
+        server = await asyncio.start_server(serve(batcher), host, port)
+        print(f"Unravelling on http://{host}:{server.sockets[0].getsockname()[1]}/unravel", file=sys.stderr)
+
+        async with server:
+            await server.serve_forever()
+    finally:
+        await batcher.close()
+
+async def post(host, port, profiles, connections=16):
+    """
+    Sends every profile to the service over a number of connections that are kept open.
+    return: list with the status and response of every profile, in order
+    """
+    queue = asyncio.Queue()
+    for i, profile in enumerate(profiles):
+        queue.put_nowait((i, profile))
+    responses = [None] * len(profiles)
+
+    async def connection():
+        reader, writer = await asyncio.open_connection(host, port)
+        try:
+            while not queue.empty():
+                i, profile = queue.get_nowait()
+                body = json.dumps({'profile': profile}).encode()
+                writer.write(f"POST /unravel HTTP/1.1\r\nHost: {host}\r\nContent-Length: {len(body)}\r\n\r\n".encode()
+                             + body)
+                await writer.drain()
+
+                status = int((await reader.readline()).split()[1])
+                headers = {}
+                while (line := await reader.readline()) not in (b'\r\n', b''):
+                    name, value = line.decode().split(':', 1)
+                    headers[name.lower()] = value.strip()
+                responses[i] = (status, json.loads(await reader.readexactly(int(headers['content-length']))))
+        finally:
+            writer.close()
+
+    await asyncio.gather(*(connection() for _ in range(min(connections, len(profiles)))))
+    return responses
+
+def load_test(host, port, amount_profiles, connections, number_of_agents=5, maximal_delegations=4):
+    """
+    Sends amount_profiles created profiles to a running service and prints the throughput.
+    """
+    import random
+    from create_data import create_rows
+
+    random.seed(0)
+    profiles = ['\n'.join(', '.join(row) for row in create_rows(number_of_agents, maximal_delegations, [0, 1], 'combined'))
+                for _ in range(amount_profiles)]
+
+    start = time.perf_counter()
+    responses = asyncio.run(post(host, port, profiles, connections))
+    seconds = time.perf_counter() - start
+
+    statuses = {}
+    for status, _ in responses:
+        statuses[status] = statuses.get(status, 0) + 1
+    print(f"{amount_profiles} profiles in {seconds:.2f}s, {amount_profiles / seconds:.0f} per second, statuses {statuses}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local HTTP service that unravels smart profiles.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--workers', type=int, default=None, help="number of processes, None for one per core")
+    parser.add_argument('--batch-size', type=int, default=32, help="largest number of profiles in a batch")
+    parser.add_argument('--delay', type=float, default=0.005, help="seconds to wait for a batch to fill")
+    parser.add_argument('--queue-limit', type=int, default=1024, help="waiting requests before requests are refused")
+    parser.add_argument('--load-test', type=int, default=None, metavar='PROFILES',
+                        help="send this number of profiles to a running service instead")
+    parser.add_argument('--connections', type=int, default=16, help="connections of the load test")
+    args = parser.parse_args(argv)
+
+    if args.load_test is not None:
+        load_test(args.host, args.port, args.load_test, args.connections)
+        return
+
+    try:
+        asyncio.run(run_service(args.host, args.port, workers=args.workers, batch_size=args.batch_size,
+                                delay=args.delay, queue_limit=args.queue_limit))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
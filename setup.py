@@ -7,80 +7,180 @@ INFO:       This file consists of a smart voting class and of helper functions
             to solve delegations and calculate the final vote of an agent.
 """
 
-import pandas as pd
 import copy
 import random
-import re
-from collections import Counter
-import string
-from cycles import find_cycles
+import time
+from cycles import CycleCounter, add_cycles
+from ballots import compile_ballot, compile_profile
+from worklist import Preparation, Worklist
+from smartprofile import SmartProfile, agent_names
+from stats import Stats
 
 class SmartVoting:
-    def __init__(self, df, agents):
+    def __init__(self, df, agents=None, preparation=None):
         """
-        Initialise values.
+        Initialise values. The profile is either the dataframe of create_profile
+        with its agents, or a SmartProfile with integer agent ids. A preparation
+        of the same profile can be shared between smart voting models, see prepare.
         """
         self.profile = df       # Delegation profile
         self.D = ['0', '1']     # Possible outcome
-        self.agents = agents
 
-    def unravel(self):
+        if isinstance(df, SmartProfile):
+            self.agents = df.agents
+            self.ballots = df.ballots       # Compiled delegation ballots
+        else:
+            self.agents = agents
+            self.ballots = compile_profile(df)  # Compiled delegation ballots
+        self.preparation = preparation      # Static structures of the profile, built on first use
+        self.worklist = None                # Worklist engine, built on first use
+
+    def prepare(self):
+        """
+        Builds the structures of the profile that all unravelling procedures share once.
+        return: the preparation of the profile, see Preparation
+        """
+        if self.preparation is None:
+            self.preparation = Preparation(self.agents, self.ballots)
+
+        return self.preparation
+
+    def unravel(self, worklist=True, cycle_metric='exact', max_cycles=None, time_budget=None, max_length=None,
+                stats=False, procedures=None):
         """
-        Unravels a valid smart profile four times with the different unravelling procedures.
+        Unravels a valid smart profile with each of the different unravelling procedures,
+        or only with the procedures in the list procedures.
+        With worklist, the worklist engine is used, otherwise the update functions are
+        applied to every agent at every preference level.
+        Cycles are counted with the cycle metric 'exact', 'length' or 'scc' and the
+        given bounds, see CycleCounter.
+        With stats, the internals of every procedure are counted and timed, see Stats.
         return: the final collective decision and number of cycles that occurred while unravelling
-                a valid smart profile
+                a valid smart profile, together with the used metric under ‘metric’, and
+                the statistics when stats is True
         """
-        algorithms = ['U', 'DU', 'RU', 'DRU']
+        updates = {'U': self.update_u, 'DU': self.update_du, 'RU': self.update_ru, 'DRU': self.update_dru}
+        algorithms = list(updates) if procedures is None else list(procedures)
+        if not algorithms or any(algorithm not in updates for algorithm in algorithms):
+            raise ValueError(f"Choose the unravelling procedures from {list(updates)}, not {procedures}")
+
         result = {}
         number_of_cycles = {}
+        truncated = []
+
+        instrumented = Stats() if stats else None
+        ballots = self.ballots
+
+        # Counting ballots get a worklist engine of their own, the one that is kept stays uninstrumented
+        if instrumented is not None:
+            self.ballots = instrumented.wrap(ballots)
+            engine = Worklist(self) if worklist else None
+        elif worklist:
+            if self.worklist is None:
+                self.worklist = Worklist(self, self.prepare())
+            engine = self.worklist
+
+        try:
+            # Calculate result for all of the unravelling procedures
+            for i, func in enumerate(updates[algorithm] for algorithm in algorithms):
+                counter = instrumented.start(algorithms[i]) if instrumented is not None else None
+                start = time.perf_counter()
+                reset_outcome(self)
+
+                # Do not add the last one as these only consist of direct votes an do not include cycles
+                levels = range(1, len(self.profile.columns))
+                cycles = CycleCounter(levels, cycle_metric, max_cycles, time_budget, max_length)
+
+                if worklist:
+                    self.X = engine.unravel(algorithms[i], cycles, counter)
+
+                while None in self.X.values():
+                    level = 1
+                    Y = copy.deepcopy(self.X)
+                    if counter is not None:
+                        counter['iterations'] += 1
+                        counter['snapshots'] += 1
+
+                    while Y == self.X:
+                        self.X = func(Y, level)
+                        if counter is not None:
+                            counter['levels'] += 1
+
+                        # Add found cycles to the cycle counter ‘cycles’
+                        add_cycles(self, cycles, level)
+
+                        level += 1
+
+                # Save number of cycles and the outcome for each algorithm
+                number_of_cycles[algorithms[i]] = cycles.count()
+                result[algorithms[i]] = self.X
+                if cycles.truncated:
+                    truncated.append(algorithms[i])
+
+                if counter is not None:
+                    counter['seconds'] += time.perf_counter() - start
+                    instrumented.add_cycles(cycles)
+        finally:
+            self.ballots = ballots
+
+        number_of_cycles['metric'] = {'name': cycle_metric, 'bound': cycles.bound(), 'truncated': truncated}
+
+        if instrumented is not None:
+            return result, number_of_cycles, instrumented
 
-        # Calculate result for all of the unravelling procedures
-        for i, func in enumerate([self.update_u, self.update_du, self.update_ru, self.update_dru]):
-            reset_outcome(self)
-            cycles = {}
+        return result, number_of_cycles
 
-            # Do not add the last one as these only consist of direct votes an do not include cycles
-            for j in range(1, len(self.profile.columns)):
-                cycles[j] = set()
+    def decide(self, procedures=None, count_cycles=False, cycle_metric='exact', max_cycles=None, time_budget=None,
+               max_length=None):
+        """
+        Computes only the collective decision of each of the unravelling procedures, or
+        of the procedures in the list procedures. The worklist engine stops as soon as
+        the votes of the unresolved agents can no longer change the majority.
+        Without count_cycles no cycles are counted at all, otherwise the cycles up to
+        the point where the unravelling stopped are counted as in unravel.
+        return: for each unravelling procedure the collective decision, whether the
+                unravelling stopped early, the number of unresolved agents and the
+                number of cycles when they are counted
+        """
+        algorithms = ['U', 'DU', 'RU', 'DRU'] if procedures is None else list(procedures)
+        if not algorithms or any(algorithm not in ['U', 'DU', 'RU', 'DRU'] for algorithm in algorithms):
+            raise ValueError(f"Choose the unravelling procedures from ['U', 'DU', 'RU', 'DRU'], not {procedures}")
 
-            while None in self.X.values():
-                level = 1
-                Y = copy.deepcopy(self.X)
-                while Y == self.X:
-                    self.X = func(Y, level)
+        if self.worklist is None:
+            self.worklist = Worklist(self, self.prepare())
 
-                    # Add found cycles to the set ‘cycles’
-                    for cycle in find_cycles(self,  level):
-                        first_letter = sorted(cycle)[0]
-                        index = cycle.index(first_letter)
-                        cycle = cycle[index:] + cycle[:index]
-                        cycles[level].add(tuple(cycle))
+        decisions = {}
+        for algorithm in algorithms:
+            cycles = None
+            if count_cycles:
+                levels = range(1, len(self.profile.columns))
+                cycles = CycleCounter(levels, cycle_metric, max_cycles, time_budget, max_length)
 
-                    level += 1
+            X = self.worklist.unravel(algorithm, cycles, decision_only=True)
 
-            # Replace list of cycles with the ammount of cycles
-            for k, y in cycles.items():
-                cycles[k] = len(y)
+            # Agents that are never resolved do not count for the majority
+            decision = self.worklist.decided()
+            if decision is None:
+                decision = majority(X)
 
-            # Save number of cycles and the outcome for each algorithm
-            number_of_cycles[algorithms[i]] = sum(cycles.values())
-            result[algorithms[i]] = self.X
+            decisions[algorithm] = {'decision': decision, 'stopped early': self.worklist.stopped_early,
+                                    'unresolved': self.worklist.unresolved}
+            if cycles is not None:
+                decisions[algorithm]['cycles'] = cycles.count()
 
-        return result, number_of_cycles
+        return decisions
 
     def update_u(self, Y, level):
         """ 
         Basic update from smart voting model proposed by Colley et al.
         return: the updated vector X
         """
+        ballots = self.ballots[level]
         for agent in self.agents:
             if self.X[agent] is None:
-                if self.profile[level][agent].strip() in self.D:
-                    self.X[agent] = self.profile[level][agent]
-                elif True:
-                    boolean, outcome = self.aggregate(Y, level, agent)
-                    if boolean:
-                        self.X[agent] = outcome
+                boolean, outcome = ballots[agent].evaluate(Y)
+                if boolean:
+                    self.X[agent] = outcome
         
         return self.X
 
@@ -90,15 +190,16 @@ class SmartVoting:
         proposed by Colley et al.
         return: the updated vector X
         """
+        ballots = self.ballots[level]
         for agent in self.agents:
             if self.X[agent] is None:
-                if self.profile[level][agent].strip() in self.D:
-                    self.X[agent] = self.profile[level][agent]
+                if ballots[agent].direct:
+                    self.X[agent] = ballots[agent].value
         
         if Y == self.X:
             for agent in self.agents:
                 if self.X[agent] is None:
-                    boolean, outcome = self.aggregate(Y, level, agent)
+                    boolean, outcome = ballots[agent].evaluate(Y)
                     if boolean:
                         self.X[agent] = outcome
             
@@ -110,18 +211,16 @@ class SmartVoting:
         model proposed by Colley et al.
         return: the updated vector X
         """
+        ballots = self.ballots[level]
         P = set()
         for agent in self.agents:
             if self.X[agent] is None:
-                if self.profile[level][agent].strip() in self.D or self.aggregate(Y, level, agent)[0]:
+                if ballots[agent].evaluate(Y)[0]:
                     P.add(agent)
         
         if P != set():
             b = random.choice(list(P))
-            if self.profile[level][b].strip() in self.D:
-                self.X[b] = self.profile[level][b]
-            else:
-                self.X[b] = self.aggregate(Y, level, b)[1]
+            self.X[b] = ballots[b].evaluate(Y)[1]
             
         return self.X
 
@@ -131,20 +230,21 @@ class SmartVoting:
         from smart voting model proposed by Colley et al.
         return: the updated vector X
         """
+        ballots = self.ballots[level]
         P, Q = set(), set()
         for agent in self.agents:
             if self.X[agent] is None:
-                if self.profile[level][agent].strip() in self.D:
+                if ballots[agent].direct:
                     P.add(agent)
-                elif self.aggregate(Y, level, agent)[0]:
+                elif ballots[agent].evaluate(Y)[0]:
                     Q.add(agent)
         
         if P != set():
             b = random.choice(list(P))
-            self.X[b] = self.profile[level][b]
+            self.X[b] = ballots[b].value
         elif Q != set():
             b = random.choice(list(Q))
-            self.X[b] = self.aggregate(Y, level, b)[1]
+            self.X[b] = ballots[b].evaluate(Y)[1]
             
         return self.X
 
@@ -155,26 +255,7 @@ class SmartVoting:
         return: True and the calculated vote when the vote is calculable
                 False when the vote is not calculable yet
         """
-        delegation = self.profile[level][agent]
-
-        # Compute the direct delegated vote
-        if len(delegation) == 1:
-            if Y[delegation] in self.D:
-                return True, Y[delegation] 
-            return False, ""
-
-        # Compute the voting rule
-        elif re.findall(r"quota\((.*?)\)", delegation):
-            boolean, outcome = compute_quotarule(self, Y, delegation)
-        # Compute the propositional logic formula
-        else:
-            boolean, outcome = compute_formula(Y, delegation)
-
-        # Check if vote is calculated
-        if boolean:
-            return True, outcome
-
-        return False, ""
+        return self.ballots[level][agent].evaluate(Y)
 
 
 def reset_outcome(Voting):
@@ -185,12 +266,29 @@ def reset_outcome(Voting):
     for agent in Voting.agents:
         Voting.X[agent] = None
 
+def majority(X):
+    """
+    Computes the collective decision of the final votes with the majority rule.
+    X: the final vector X, or a string with the vote of every agent
+    return: '1' or '0' when more than half of the agents vote so, 'tie' otherwise
+    """
+    votes = list(X.values()) if isinstance(X, dict) else list(X)
+
+    if votes.count('1') * 2 > len(votes):
+        return '1'
+    elif votes.count('0') * 2 > len(votes):
+        return '0'
+
+    return 'tie'
+
 def create_profile(folder, num_agents, maximal_delegations):
     """
     Creates dataframe of valid smart profile with the given parameters.
     return: the valid smart profile as dataframe, and the agents as list
     """
-    agents = list(string.ascii_uppercase)[:num_agents]
+    import pandas as pd
+
+    agents = agent_names(num_agents)
     dataframe = pd.read_csv(folder, sep= ', ', names = [i for i in range(1,maximal_delegations+1)], dtype = str, engine='python')
     dataframe.index = agents[:num_agents]
     dataframe = dataframe.fillna('-')
@@ -203,22 +301,7 @@ def compute_quotarule(Voting, Y, delegation):
     return: True and the calculated vote when it is calculable
              False when the vote is not calculable yet
     """
-    participants, quota = re.findall(r"\((.*?)\)", delegation)[0].split(',')
-    participants = participants.split()
-
-    for i, participant in enumerate(participants):
-        if Y[participant] in Voting.D:
-            participants[i] = Y[participant]
-
-    count = Counter(participants)
-
-    # Check if the vote can be calculated with the current known votes
-    if count['1'] >= int(quota):
-        return True, '1'
-    elif count['0'] > (len(participants) - int(quota)):
-        return True, '0'
-
-    return False, ''
+    return compile_ballot(delegation).evaluate(Y)
 
 def compute_formula(Y, delegation):
     """
@@ -226,78 +309,4 @@ def compute_formula(Y, delegation):
     return: True and the calculated vote when it is calculable
             False when the vote is not calculable yet
     """
-    operations = {'0&1': '0', '1&0': '0','1&1': '1','0&0': '0', '0|1': '1', '1|0': '1','1|1': '1','0|0': '0'}
-
-    # Replace all agents in string with its corresponding outcome
-    for a in Y:
-        if a in delegation and Y[a] is not None:
-            delegation = delegation.replace(a, Y[a])
-
-    delegation = delegation.replace(' ', '')
-
-    # Solve all negations in string
-    for negation in re.findall('~.', delegation):
-        if negation == '~1':
-            delegation = delegation.replace(negation, '0')
-        elif negation == '~0':
-            delegation = delegation.replace(negation, '1')
-        else:
-            delegation = delegation.replace(negation, negation[1])
-                        
-    # Keep going until there is a single correct outcome
-    while len(delegation) != 1:
-        brackets_delegation = copy.deepcopy(delegation)
-
-        # Check if there are brackets in the formula
-        if re.search(r"\(.*\)", delegation):
-            # Find most inner brackets
-            while re.search(r"\(.*\)", brackets_delegation):
-                brackets_delegation = re.findall(r"\(.*\)", brackets_delegation)[0][1:-1]
-
-            # Solve subformula and replace in the delegation
-            boolean, updated_delegation = replace_formula(brackets_delegation, operations)
-            delegation = delegation.replace('(' + brackets_delegation + ')', updated_delegation)
-
-        else:
-            boolean, delegation = replace_formula(delegation, operations)
-
-        # Propositional logic is not solvable 
-        if not boolean:
-            return False, ''
-
-    # Check if delegation has a valid outcome
-    if delegation != '?':
-        return True, str(delegation)
-    else:
-        return False, ''
-
-def replace_formula(delegation, operations):
-    """
-    Solves formula of propositional logic
-    return: True and the calculated formula when it is calculable
-            False when the formula is not calculable yet
-    """
-    while len(delegation) != 1:
-        if delegation[0:3] in operations:
-            delegation = operations[delegation[0:3]] + delegation[3:]
-
-        elif '0' in delegation[0:3]:
-            # A logic formula with '0' and '&' always results in '0'
-            if re.search(r"0&.", delegation[0:3]) or re.search(r".&0", delegation[0:3]):
-                delegation = '0' + delegation[3:]
-            # The outcome cannot yet be determined
-            elif re.search(r"0|.", delegation[0:3]) or re.search(r".|0", delegation[0:3]):
-                delegation = '?' + delegation[3:]
-
-        elif '1' in delegation[0:3]:
-            # A logic formula with '1' and '|' always results in '1'
-            if re.search(r"1|.", delegation[0:3]) or re.search(r".|1", delegation[0:3]):
-                delegation = '1' + delegation[3:]
-            # The outcome cannot yet be determined
-            elif re.search(r"1&.", delegation[0:3]) or re.search(r".&1", delegation[0:3]):
-                delegation = '?' + delegation[3:]
-
-        else:
-            return False, ''
-
-    return True, delegation
\ No newline at end of file
+    return compile_ballot(delegation).evaluate(Y)
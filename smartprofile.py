@@ -0,0 +1,98 @@
+"""
+DISCLAIMER: This file was created for the thesis of Romana Wilschut for the
+            bachelor ‘Artificial Intelligence’ at the University of Amsterdam.
+NAME:       Romana Wilschut
+UVA ID:     12156884
+INFO:       This file consists of a compact smart profile with integer agent ids.
+            The ballots are compiled once and stored per preference level in lists
+            indexed by agent id, the direct votes are stored in NumPy arrays.
+"""
+
+import string
+import numpy as np
+from ballots import compile_ballot
+
+def agent_names(number_of_agents):
+    """
+    Names of the agents in a smart profile file. Up to 26 agents are named with
+    a single letter, larger electorates with a letter followed by a number.
+    return: list of agent names
+    """
+    if number_of_agents <= len(string.ascii_uppercase):
+        return list(string.ascii_uppercase)[:number_of_agents]
+
+    return [f'A{i}' for i in range(number_of_agents)]
+
+def read_rows(file):
+    """
+    Reads the delegation ballots of a smart profile file of create_data.
+    return: for every agent the delegation ballot as a list of cells
+    """
+    with open(file) as profile_file:
+        return [line.rstrip('\n').split(', ') for line in profile_file if line.strip()]
+
+class SmartProfile:
+    __slots__ = ('agents', 'names', 'columns', 'ballots', 'votes')
+
+    def __init__(self, rows, names=None):
+        """
+        Compiles a smart profile from the delegation ballot of every agent, given as
+        a list of cells. Agent i is named names[i] in the cells of the ballots.
+        """
+        names = agent_names(len(rows)) if names is None else list(names)
+        index = {name: i for i, name in enumerate(names)}
+
+        self.set_ballots([[compile_ballot(delegation, index) for delegation in row] for row in rows], names)
+
+    @classmethod
+    def from_ballots(cls, ballot_rows, names=None):
+        """
+        Creates a smart profile from ballots that are compiled already, with integer agent ids.
+        """
+        profile = cls.__new__(cls)
+        profile.set_ballots(ballot_rows, agent_names(len(ballot_rows)) if names is None else list(names))
+        return profile
+
+    def set_ballots(self, ballot_rows, names):
+        """
+        Stores the compiled ballots of every agent per preference level.
+        """
+        number_of_agents = len(ballot_rows)
+        maximal_delegations = max((len(row) for row in ballot_rows), default=0)
+
+        self.agents = list(range(number_of_agents))
+        self.names = names
+        self.columns = list(range(1, maximal_delegations + 1))
+
+        # Compiled ballot per preference level, indexed by agent id
+        self.ballots = {level: [None] * number_of_agents for level in self.columns}
+        # Direct vote per preference level and agent, -1 when the agent does not vote directly
+        self.votes = np.full((maximal_delegations, number_of_agents), -1, dtype=np.int8)
+
+        for agent, row in enumerate(ballot_rows):
+            for j, ballot in enumerate(row):
+                self.ballots[j + 1][agent] = ballot
+
+                if ballot is not None and ballot.direct:
+                    self.votes[j, agent] = int(ballot.value)
+
+    @classmethod
+    def from_dataframe(cls, dataframe):
+        """
+        Compiles a smart profile from the dataframe of create_profile.
+        """
+        rows = [[dataframe[level][name] for level in dataframe.columns] for name in dataframe.index]
+        return cls(rows, dataframe.index)
+
+    @classmethod
+    def read(cls, file, names=None):
+        """
+        Compiles a smart profile from a file of create_data without pandas.
+        """
+        return cls(read_rows(file), names)
+
+    def named(self, X):
+        """
+        return: vector X with the agent names instead of the agent ids
+        """
+        return {self.names[agent]: vote for agent, vote in X.items()}
@@ -0,0 +1,138 @@
+"""
+DISCLAIMER: This file was created for the thesis of Romana Wilschut for the
+            bachelor ‘Artificial Intelligence’ at the University of Amsterdam.
+NAME:       Romana Wilschut
+UVA ID:     12156884
+INFO:       This file consists of the statistics of unravelling smart profiles.
+            They are only collected when asked for, by wrapping the ballots of a
+            profile in counting ballots, and can be merged over many profiles.
+"""
+
+from collections import Counter
+
+# Counters of every unravelling procedure
+COUNTERS = ['profiles', 'iterations', 'levels', 'aggregate', 'resolved', 'undetermined',
+            'snapshots', 'cycle searches', 'cycles enumerated', 'seconds', 'cycle seconds']
+
+class CountingBallot:
+    """
+    Compiled ballot that counts its evaluations and their outcome in the
+    counter of the current unravelling procedure.
+    """
+    __slots__ = ('ballot', 'stats', 'direct', 'agents', 'value')
+
+    def __init__(self, ballot, stats):
+        self.ballot = ballot
+        self.stats = stats
+        self.direct = ballot.direct
+        self.agents = ballot.agents
+        self.value = getattr(ballot, 'value', None)
+
+    def evaluate(self, Y):
+        boolean, outcome = self.ballot.evaluate(Y)
+
+        self.stats.count(boolean)
+        return boolean, outcome
+
+    def tracker(self):
+        return CountingTracker(self.ballot.tracker(), self.stats)
+
+class CountingTracker:
+    """
+    Incremental state of a ballot that counts its updates like a counting ballot.
+    """
+    __slots__ = ('tracker', 'stats')
+
+    def __init__(self, tracker, stats):
+        self.tracker = tracker
+        self.stats = stats
+
+    def result(self):
+        boolean, outcome = self.tracker.result()
+        self.stats.count(boolean)
+        return boolean, outcome
+
+    def assign(self, agent, vote):
+        boolean, outcome = self.tracker.assign(agent, vote)
+        self.stats.count(boolean)
+        return boolean, outcome
+
+class Stats:
+    def __init__(self):
+        """
+        Empty statistics, with a counter for every unravelling procedure.
+        """
+        self.procedures = {}
+        self.current = None
+
+    def start(self, procedure):
+        """
+        Makes the counter of the procedure the current counter.
+        return: the counter
+        """
+        self.current = self.procedures.setdefault(procedure, Counter({counter: 0 for counter in COUNTERS}))
+        self.current['profiles'] += 1
+        return self.current
+
+    def count(self, boolean):
+        """
+        Counts a check of a ballot and whether its vote was calculable, checks
+        while the profile is prepared are not counted for any procedure.
+        """
+        if self.current is None:
+            return
+
+        self.current['aggregate'] += 1
+        self.current['resolved' if boolean else 'undetermined'] += 1
+
+    def wrap(self, ballots):
+        """
+        return: the compiled ballots per preference level with every ballot wrapped in a counting ballot
+        """
+        counting = lambda ballot: None if ballot is None else CountingBallot(ballot, self)
+        wrapped = {}
+
+        # Ballots of a SmartProfile are lists indexed by agent id, those of a dataframe dictionaries
+        for level, level_ballots in ballots.items():
+            if isinstance(level_ballots, dict):
+                wrapped[level] = {agent: counting(ballot) for agent, ballot in level_ballots.items()}
+            else:
+                wrapped[level] = [counting(ballot) for ballot in level_ballots]
+
+        return wrapped
+
+    def add_cycles(self, cycles):
+        """
+        Adds the cycle searches of the cycle counter ‘cycles’ to the current counter.
+        """
+        self.current['cycle searches'] += cycles.searches
+        self.current['cycles enumerated'] += cycles.enumerated
+        self.current['cycle seconds'] += cycles.seconds
+
+    def merge(self, other):
+        """
+        Adds the statistics of other, for example of another profile.
+        return: these statistics
+        """
+        for procedure, counter in other.procedures.items():
+            self.procedures.setdefault(procedure, Counter({counter: 0 for counter in COUNTERS})).update(counter)
+
+        return self
+
+    def __add__(self, other):
+        return Stats().merge(self).merge(other)
+
+    def __radd__(self, other):
+        # Supports sum() over statistics, which starts with 0
+        if other == 0:
+            return Stats().merge(self)
+        return NotImplemented
+
+    def as_dict(self):
+        """
+        return: for every unravelling procedure a dictionary with its counters
+        """
+        return {procedure: dict(counter) for procedure, counter in self.procedures.items()}
+
+    def __repr__(self):
+        return f"Stats({self.as_dict()})"
@@ -0,0 +1,133 @@
+"""
+DISCLAIMER: This file was created for the thesis of Romana Wilschut for the
+            bachelor ‘Artificial Intelligence’ at the University of Amsterdam.
+NAME:       Romana Wilschut
+UVA ID:     12156884
+INFO:       This file consists of a binary store for many smart profiles in a
+            single file. The cells of all ballots are stored with a fixed width
+            after an index of the profiles, and are read with numpy.memmap.
+"""
+
+import sys
+from array import array
+import numpy as np
+from smartprofile import SmartProfile, read_rows
+
+MAGIC = b'SMARTPRF'
+VERSION = 1
+
+# Header, index entry of a profile and the cells follow each other in the file
+HEADER = np.dtype([('magic', 'S8'), ('version', '<u4'), ('width', '<u4'), ('profiles', '<u8'), ('cells', '<u8')])
+INDEX = np.dtype([('offset', '<u8'), ('agents', '<u4'), ('levels', '<u4')])
+
+def write_store(file, profiles):
+    """
+    Writes smart profiles to a single binary file. Every profile is given as
+    the delegation ballot of every agent as a list of cells, see create_rows.
+    The profiles are read twice, first for the width of the cells and the index
+    and then to write the cells profile by profile, so only a single profile is
+    in memory at once. Give a list or a collection like ProfileFiles, not an iterator.
+    """
+    if iter(profiles) is profiles:
+        raise TypeError("write_store reads the profiles twice, give a collection instead of an iterator")
+
+    width = 1
+    agents, levels = array('I'), array('I')
+    for rows in profiles:
+        width = max([width] + [len(cell.encode()) for row in rows for cell in row])
+        agents.append(len(rows))
+        levels.append(max((len(row) for row in rows), default=0))
+
+    index = np.zeros(len(agents), dtype=INDEX)
+    index['agents'] = agents
+    index['levels'] = levels
+    sizes = index['agents'].astype(np.uint64) * index['levels']
+    index['offset'][1:] = np.cumsum(sizes)[:-1]
+    header = np.array([(MAGIC, VERSION, width, len(index), int(sizes.sum()))], dtype=HEADER)
+
+    with open(file, 'wb') as store_file:
+        store_file.write(header.tobytes())
+        store_file.write(index.tobytes())
+
+        # Shorter ballots are filled with empty cells
+        for (_, number_of_agents, number_of_levels), rows in zip(index, profiles):
+            block = np.zeros((number_of_agents, number_of_levels), dtype=f'S{width}')
+            for agent, row in enumerate(rows):
+                block[agent, :len(row)] = [cell.encode() for cell in row]
+            store_file.write(block.tobytes())
+
+class ProfileFiles:
+    """
+    Smart profile files of create_data, which are read again every time they are iterated.
+    """
+    def __init__(self, files):
+        self.files = list(files)
+
+    def __iter__(self):
+        for csv_file in self.files:
+            yield read_rows(csv_file)
+
+def convert_csv(files, file):
+    """
+    Converts smart profile files of create_data to a single binary file,
+    in the order of files.
+    """
+    write_store(file, ProfileFiles(files))
+
+class ProfileStore:
+    def __init__(self, file):
+        """
+        Opens a binary file of smart profiles without reading the cells.
+        """
+        header = np.memmap(file, dtype=HEADER, mode='r', shape=(1,))[0]
+        if header['magic'] != MAGIC or header['version'] != VERSION:
+            raise ValueError(f"{file} is not a smart profile store of version {VERSION}")
+
+        profiles, total = int(header['profiles']), int(header['cells'])
+        self.width = int(header['width'])
+        self.index = np.memmap(file, dtype=INDEX, mode='r', offset=HEADER.itemsize, shape=(profiles,))
+        self.cells = np.memmap(file, dtype=f'S{self.width}', mode='r',
+                               offset=HEADER.itemsize + profiles * INDEX.itemsize, shape=(total,))
+
+    def __len__(self):
+        return len(self.index)
+
+    def __getitem__(self, i):
+        return SmartProfile(self.rows(i))
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def block(self, i):
+        """
+        return: view on the cells of profile i with shape (agents, levels), without a copy
+        """
+        offset, agents, levels = (int(value) for value in self.index[i])
+        return self.cells[offset:offset + agents * levels].reshape(agents, levels)
+
+    def rows(self, i):
+        """
+        return: for every agent of profile i the delegation ballot as a list of cells
+        """
+        return [[cell.decode() for cell in row if cell] for row in self.block(i)]
+
+    def slice(self, start, stop):
+        """
+        Selects a range of profiles with the same number of agents and preference levels.
+        return: view on the cells with shape (profiles, agents, levels), without a copy
+        """
+        index = self.index[start:stop]
+        if len(index) == 0:
+            raise ValueError("Empty range of profiles")
+
+        agents, levels = int(index['agents'][0]), int(index['levels'][0])
+        if (index['agents'] != agents).any() or (index['levels'] != levels).any():
+            raise ValueError("Profiles in a slice need the same number of agents and preference levels")
+
+        offset = int(index['offset'][0])
+        return self.cells[offset:offset + len(index) * agents * levels].reshape(len(index), agents, levels)
+
+if __name__ == "__main__":
+    # Usage: python store.py <store file> <profile files>
+    convert_csv(sys.argv[2:], sys.argv[1])
@@ -0,0 +1,248 @@
+"""
+DISCLAIMER: This file was created for the thesis of Romana Wilschut for the
+            bachelor ‘Artificial Intelligence’ at the University of Amsterdam.
+NAME:       Romana Wilschut
+UVA ID:     12156884
+INFO:       This file runs a sweep over a grid of parameters. Every cell of the
+            grid, a combination of parameters and a seed, is an experiment of
+            which the statistics are stored in an SQLite database, keyed by the
+            parameters, the seed and the version of the code. A sweep that is
+            interrupted continues with the cells that are not stored yet.
+"""
+
+import argparse
+import csv
+import hashlib
+import itertools
+import json
+import os
+import sqlite3
+import sys
+import time
+from runner import ALGORITHMS, run_experiment
+from setup import majority
+
+PARAMETERS = ['agents', 'delegations', 'lower', 'upper', 'type', 'profiles']
+
+# Modules of which the results of a cell depend
+SOURCES = ['ballots.py', 'create_data.py', 'cycles.py', 'runner.py', 'setup.py', 'smartprofile.py', 'worklist.py']
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cells (
+    agents INTEGER, delegations INTEGER, lower REAL, upper REAL, type TEXT, profiles INTEGER,
+    seed INTEGER, version TEXT, statistics TEXT, seconds REAL, created TEXT,
+    PRIMARY KEY (agents, delegations, lower, upper, type, profiles, seed, version)
+)
+"""
+
+def code_version():
+    """
+    return: hash of the source of the modules that the results depend on
+    """
+    digest = hashlib.sha256()
+    folder = os.path.dirname(os.path.abspath(__file__))
+    for source in SOURCES:
+        with open(os.path.join(folder, source), 'rb') as source_file:
+            digest.update(source_file.read())
+
+    return digest.hexdigest()[:16]
+
+def grid_cells(grid):
+    """
+    Expands a grid with lists of 'agents', 'delegations', 'bounds' and 'types', the
+    number of 'profiles' per cell and a list of 'seeds' or a number of 'repeats'.
+    return: list of cells as dictionaries with the parameters and the seed
+    """
+    seeds = grid.get('seeds', range(grid.get('repeats', 1)))
+    cells = []
+
+    for agents, delegations, (lower, upper), type_of_profile, seed in itertools.product(
+            grid['agents'], grid['delegations'], grid['bounds'], grid['types'], seeds):
+        cells.append({'agents': agents, 'delegations': delegations, 'lower': float(lower), 'upper': float(upper),
+                      'type': type_of_profile, 'profiles': grid.get('profiles', 100), 'seed': seed})
+
+    return cells
+
+def cell_statistics(results):
+    """
+    Summarises the results of an experiment in statistics that can be added up over cells.
+    return: for each unravelling procedure the number of profiles, the sum, sum of squares
+            and maximum of the number of cycles, the number of profiles with a cycle and
+            how often each collective decision occurred
+    """
+    statistics = {}
+
+    for algorithm in ALGORITHMS:
+        cycles = [number_of_cycles[algorithm] for _, number_of_cycles in results]
+        decisions = {'0': 0, '1': 0, 'tie': 0}
+        for outcome, _ in results:
+            decisions[majority(outcome[algorithm])] += 1
+
+        statistics[algorithm] = {'profiles': len(cycles), 'cycles': sum(cycles), 'squares': sum(c * c for c in cycles),
+                                 'maximum': max(cycles, default=0), 'with cycles': sum(1 for c in cycles if c),
+                                 'decisions': decisions}
+
+    return statistics
+
+def merge_statistics(total, statistics):
+    """
+    Adds the statistics of a cell to the total statistics.
+    """
+    for algorithm, values in statistics.items():
+        if algorithm not in total:
+            total[algorithm] = {'profiles': 0, 'cycles': 0, 'squares': 0, 'maximum': 0, 'with cycles': 0,
+                                'decisions': {'0': 0, '1': 0, 'tie': 0}}
+        merged = total[algorithm]
+
+        for key in ['profiles', 'cycles', 'squares', 'with cycles']:
+            merged[key] += values[key]
+        merged['maximum'] = max(merged['maximum'], values['maximum'])
+        for decision, count in values['decisions'].items():
+            merged['decisions'][decision] += count
+
+class SweepStore:
+    def __init__(self, file):
+        """
+        Opens or creates the SQLite database of a sweep.
+        """
+        self.connection = sqlite3.connect(file)
+        self.connection.execute(SCHEMA)
+        self.connection.commit()
+
+    def close(self):
+        self.connection.close()
+
+    def key(self, cell, version):
+        return tuple(cell[parameter] for parameter in PARAMETERS) + (cell['seed'], version)
+
+    def done(self, version):
+        """
+        return: set with the keys of the stored cells of a version of the code
+        """
+        rows = self.connection.execute(f"SELECT {', '.join(PARAMETERS)}, seed, version FROM cells WHERE version = ?",
+                                       (version,))
+        return set(rows)
+
+    def add(self, cell, version, statistics, seconds):
+        """
+        Stores the statistics of a cell, every cell is committed on its own so an
+        interrupted sweep loses at most the cell it was running.
+        """
+        self.connection.execute("INSERT OR REPLACE INTO cells VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                                self.key(cell, version) + (json.dumps(statistics), seconds,
+                                                           time.strftime('%Y-%m-%dT%H:%M:%S')))
+        self.connection.commit()
+
+    def cells(self, version=None):
+        """
+        return: list with the parameters, seed and statistics of every stored cell,
+                only of the given version of the code when version is not None
+        """
+        query = f"SELECT {', '.join(PARAMETERS)}, seed, version, statistics FROM cells"
+        rows = self.connection.execute(query + " WHERE version = ?", (version,)) if version else \
+               self.connection.execute(query)
+
+        columns = PARAMETERS + ['seed', 'version']
+        return [dict(zip(columns, row[:-1]), statistics=json.loads(row[-1])) for row in rows]
+
+def run_sweep(grid, file, workers=None, chunksize=16, verbose=True):
+    """
+    Runs every cell of the grid that is not stored yet for the current version of the code.
+    return: the number of cells that were run
+    """
+    version = code_version()
+    store = SweepStore(file)
+    run = 0
+
+    try:
+        cells = grid_cells(grid)
+        done = store.done(version)
+        todo = [cell for cell in cells if store.key(cell, version) not in done]
+        if verbose:
+            print(f"{len(cells) - len(todo)} of {len(cells)} cells are stored for version {version}", file=sys.stderr)
+
+        for cell in todo:
+            start = time.perf_counter()
+            results = run_experiment(cell['agents'], cell['delegations'], [cell['lower'], cell['upper']], cell['type'],
+                                     cell['profiles'], seed=cell['seed'], workers=workers, chunksize=chunksize)
+            seconds = time.perf_counter() - start
+
+            store.add(cell, version, cell_statistics(results), seconds)
+            run += 1
+            if verbose:
+                print(f"{run}/{len(todo)} {cell} {seconds:.2f}s", file=sys.stderr)
+    finally:
+        store.close()
+
+    return run
+
+def summary_table(file, by=('agents', 'delegations', 'lower', 'upper', 'type'), version=None):
+    """
+    Aggregates the stored cells over the seeds and the parameters that are not in by.
+    return: list of rows with the parameters in by and for each unravelling procedure
+            the mean and standard deviation of the number of cycles, the share of
+            profiles with a cycle, the maximum and the share of each collective decision
+    """
+    store = SweepStore(file)
+    try:
+        cells = store.cells(version)
+    finally:
+        store.close()
+
+    groups = {}
+    for cell in cells:
+        group = groups.setdefault(tuple(cell[parameter] for parameter in by), {'cells': 0, 'statistics': {}})
+        group['cells'] += 1
+        merge_statistics(group['statistics'], cell['statistics'])
+
+    table = []
+    for values, group in sorted(groups.items()):
+        row = dict(zip(by, values), cells=group['cells'])
+        for algorithm, statistics in group['statistics'].items():
+            n = max(statistics['profiles'], 1)
+            mean = statistics['cycles'] / n
+            row[f'{algorithm} profiles'] = statistics['profiles']
+            row[f'{algorithm} mean cycles'] = mean
+            row[f'{algorithm} std cycles'] = max(statistics['squares'] / n - mean * mean, 0) ** 0.5
+            row[f'{algorithm} with cycles'] = statistics['with cycles'] / n
+            row[f'{algorithm} max cycles'] = statistics['maximum']
+            for decision, count in statistics['decisions'].items():
+                row[f'{algorithm} decision {decision}'] = count / n
+        table.append(row)
+
+    return table
+
+def write_table(file, table):
+    """
+    Writes a summary table to a CSV file.
+    """
+    with open(file, 'w', newline='') as table_file:
+        writer = csv.DictWriter(table_file, fieldnames=list(table[0]) if table else [])
+        writer.writeheader()
+        writer.writerows(table)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run a sweep over a grid of parameters.")
+    parser.add_argument('grid', help="JSON file with lists of 'agents', 'delegations', 'bounds' and 'types', "
+                                     "the number of 'profiles' per cell and 'seeds' or 'repeats'")
+    parser.add_argument('--database', default='sweep.sqlite', help="SQLite database of the results")
+    parser.add_argument('--workers', type=int, default=None, help="number of processes, 0 for none")
+    parser.add_argument('--chunksize', type=int, default=16, help="profiles per task")
+    parser.add_argument('--by', nargs='+', default=['agents', 'delegations', 'lower', 'upper', 'type'],
+                        choices=PARAMETERS, help="parameters of the rows of the summary table")
+    parser.add_argument('--table', default=None, help="CSV file of the summary table")
+    args = parser.parse_args(argv)
+
+    with open(args.grid) as grid_file:
+        grid = json.load(grid_file)
+
+    run_sweep(grid, args.database, args.workers, args.chunksize)
+    table = summary_table(args.database, args.by, code_version())
+
+    if args.table is not None:
+        write_table(args.table, table)
+    for row in table:
+        print(row)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+"""
+DISCLAIMER: This file was created for the thesis of Romana Wilschut for the
+            bachelor ‘Artificial Intelligence’ at the University of Amsterdam.
+NAME:       Romana Wilschut
+UVA ID:     12156884
+INFO:       This file checks with pytest that cells of a smart profile are
+            compiled as formulas in disjunctive normal form or quota rules, and
+            that other cells are refused instead of compiled to another ballot.
+"""
+
+import pytest
+from ballots import Delegate, Formula, QuotaRule, compile_ballot
+
+@pytest.mark.parametrize('cell', ['A & (B | C)', '(A | B) & C', '~(A & B)', '((A & B)) | C', 'A & ((B))',
+                                  'quota(A B,2) | C', 'C & quota(A B,2)', '~quota(A B,2)',
+                                  '(A & B', 'A & B)', 'A B', 'A |', '& A', '~'])
+def test_refuses_other_formulas(cell):
+    with pytest.raises(ValueError):
+        compile_ballot(cell)
+
+def test_formula():
+    ballot = compile_ballot('(A & ~B) | C')
+
+    assert isinstance(ballot, Formula)
+    assert ballot.conjunctions == ((('A', False), ('B', True)), (('C', False),))
+    assert ballot.evaluate({'A': '0', 'B': None, 'C': '1'}) == (True, '1')
+    assert ballot.evaluate({'A': '0', 'B': None, 'C': '0'}) == (True, '0')
+
+def test_conjunction_with_brackets():
+    ballot = compile_ballot('(A & B) & ~C')
+
+    assert ballot.conjunctions == ((('A', False), ('B', False), ('C', True)),)
+
+def test_quota_rule():
+    ballot = compile_ballot('quota(A B C, 2)', {'A': 0, 'B': 1, 'C': 2})
+
+    assert isinstance(ballot, QuotaRule)
+    assert (ballot.agents, ballot.quota) == ((0, 1, 2), 2)
+
+def test_delegate():
+    assert isinstance(compile_ballot('A12', {'A12': 12}), Delegate)
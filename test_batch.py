@@ -0,0 +1,47 @@
+"""
+DISCLAIMER: This file was created for the thesis of Romana Wilschut for the
+            bachelor ‘Artificial Intelligence’ at the University of Amsterdam.
+NAME:       Romana Wilschut
+UVA ID:     12156884
+INFO:       This file checks with pytest that the batch version of U and DU
+            gives the same final votes as SmartVoting.unravel.
+"""
+
+import random
+import numpy as np
+import pytest
+from batch import unravel_batch
+from create_data import create_rows
+from setup import SmartVoting
+from smartprofile import SmartProfile
+
+def final_votes(profile, procedure):
+    """
+    return: the final votes of SmartVoting.unravel in the encoding of unravel_batch
+    """
+    X = SmartVoting(profile).unravel(procedures=[procedure], max_cycles=100)[0][procedure]
+    return [-1 if X[agent] is None else int(X[agent]) for agent in profile.agents]
+
+@pytest.mark.parametrize('rows', [
+    [['B & ~B', '0'], ['1']],                           # Contradictory conjunction
+    [['(B & ~B) | C', '0'], ['1'], ['1']],
+    [['quota(B C C, 2)', '1'], ['1'], ['0']],           # Participant C counts twice
+    [['quota(B B C, 2)', '0'], ['1'], ['0']],
+])
+def test_batch_matches_smart_voting(rows):
+    profile = SmartProfile(rows)
+    outcome, _ = unravel_batch([profile])
+
+    for procedure in ['U', 'DU']:
+        assert outcome[procedure][0].tolist() == final_votes(profile, procedure)
+
+def test_batch_matches_smart_voting_on_created_profiles():
+    random.seed(0)
+    np.random.seed(0)
+    profiles = [SmartProfile(create_rows(5, 3, [0, 1], 'combined')) for _ in range(30)]
+    profiles = [profile for profile in profiles if len(profile.columns) == len(profiles[0].columns)]
+    outcome, _ = unravel_batch(profiles)
+
+    for procedure in ['U', 'DU']:
+        for p, profile in enumerate(profiles):
+            assert outcome[procedure][p].tolist() == final_votes(profile, procedure)
@@ -0,0 +1,30 @@
+"""
+DISCLAIMER: This file was created for the thesis of Romana Wilschut for the
+            bachelor ‘Artificial Intelligence’ at the University of Amsterdam.
+NAME:       Romana Wilschut
+UVA ID:     12156884
+INFO:       This file checks with pytest that agents of an electorate never
+            delegate to themselves, also when the electorate is smaller than
+            the neighbourhood of an agent.
+"""
+
+import random
+import numpy as np
+import pytest
+from electorate import NETWORKS, create_electorate, create_network
+from smartprofile import SmartProfile
+
+@pytest.mark.parametrize('network', NETWORKS)
+@pytest.mark.parametrize('number_of_agents', [2, 3, 4, 5])
+def test_no_self_delegation(network, number_of_agents):
+    for seed in range(10):
+        random.seed(seed)
+        np.random.seed(seed)
+
+        neighbours = create_network(number_of_agents, network, degree=20)
+        assert all(agent not in neighbours[agent] for agent in range(number_of_agents))
+
+        profile = SmartProfile(create_electorate(number_of_agents, 4, [0, 1], 'combined', network, degree=20))
+        for level in profile.columns:
+            for agent, ballot in enumerate(profile.ballots[level]):
+                assert ballot is None or agent not in ballot.agents
@@ -0,0 +1,24 @@
+"""
+DISCLAIMER: This file was created for the thesis of Romana Wilschut for the
+            bachelor ‘Artificial Intelligence’ at the University of Amsterdam.
+NAME:       Romana Wilschut
+UVA ID:     12156884
+INFO:       This file checks with pytest that unravelling a profile from a cold
+            start stays within the import time budget of ‘python main.py imports’.
+"""
+
+import random
+from create_data import create_rows, write_profile
+from main import import_check
+
+BUDGET = 1.0    # Seconds
+
+def test_import_budget(tmp_path):
+    random.seed(0)
+    file = str(tmp_path / 'profile.csv')
+    write_profile(file, create_rows(10, 4, [0, 1], 'combined'))
+
+    seconds, loaded = import_check(file)
+
+    assert loaded == [], f"Heavy modules were imported: {loaded}"
+    assert seconds <= BUDGET, f"Unravelling took {seconds:.3f}s from a cold start"
@@ -0,0 +1,286 @@
+"""
+DISCLAIMER: This file was created for the thesis of Romana Wilschut for the
+            bachelor ‘Artificial Intelligence’ at the University of Amsterdam.
+NAME:       Romana Wilschut
+UVA ID:     12156884
+INFO:       This file consists of a worklist engine that unravels a valid smart
+            profile. A reverse dependency index keeps track of which ballots
+            mention an agent, so only these are updated when the vote of the
+            agent is fixed. The ballots are tracked incrementally, so updating
+            a ballot does not evaluate it again.
+"""
+
+import random
+from functools import cached_property
+from cycles import DelegationGraph
+
+class Candidates:
+    """
+    Calculable ballots of unresolved agents at a preference level, which supports
+    adding, removing and choosing a random agent in constant time.
+    """
+    __slots__ = ('agents', 'votes', 'position')
+
+    def __init__(self):
+        self.agents = []
+        self.votes = {}
+        self.position = {}
+
+    def __len__(self):
+        return len(self.agents)
+
+    def __contains__(self, agent):
+        return agent in self.votes
+
+    def add(self, agent, vote):
+        self.position[agent] = len(self.agents)
+        self.agents.append(agent)
+        self.votes[agent] = vote
+
+    def discard(self, agent):
+        if agent not in self.votes:
+            return
+
+        # Move the last agent to the position of the removed agent
+        index = self.position.pop(agent)
+        last = self.agents.pop()
+        if last != agent:
+            self.agents[index] = last
+            self.position[last] = index
+        del self.votes[agent]
+
+    def items(self):
+        return list(self.votes.items())
+
+    @classmethod
+    def of(cls, items):
+        """
+        return: candidates with the (agent, vote) items
+        """
+        candidates = cls()
+        candidates.agents = [agent for agent, _ in items]
+        candidates.votes = dict(items)
+        candidates.position = {agent: i for i, agent in enumerate(candidates.agents)}
+        return candidates
+
+class Preparation:
+    def __init__(self, agents, ballots):
+        """
+        Everything of a profile that does not change while it is unravelled, which is
+        built once and shared by all unravelling procedures: the compiled ballots, the
+        direct votes and the ballots that are calculable without any known vote per
+        preference level, the reverse dependency index and the delegation graphs,
+        which are only built when cycles are counted.
+        """
+        self.agents = agents
+        self.ballots = ballots
+        self.levels = sorted(ballots)
+
+        # For each agent the (agent, level) ballots that mention this agent
+        self.dependents = {agent: [] for agent in self.agents}
+        # Direct votes and initially calculable delegations per preference level as (agent, vote)
+        self.direct = {level: [] for level in self.levels}
+        self.delegated = {level: [] for level in self.levels}
+
+        for level in self.levels:
+            for agent in self.agents:
+                ballot = self.ballots[level][agent]
+                if ballot is None:
+                    continue
+                elif ballot.direct:
+                    self.direct[level].append((agent, ballot.value))
+                    continue
+
+                for delegate in set(ballot.agents):
+                    self.dependents[delegate].append((agent, level))
+
+                boolean, outcome = ballot.tracker().result()
+                if boolean:
+                    self.delegated[level].append((agent, outcome))
+
+    @cached_property
+    def graphs(self):
+        """
+        return: the delegation graph of each preference level, of which the edges never change
+        """
+        return {level: DelegationGraph(self.agents, self.ballots[level]) for level in self.levels}
+
+class Worklist:
+    def __init__(self, Voting, preparation=None):
+        """
+        Unravels the profile of a smart voting model with the structures of its
+        preparation, which is built here when it is not given.
+        """
+        if preparation is None:
+            preparation = Preparation(Voting.agents, Voting.ballots)
+
+        self.Voting = Voting
+        self.preparation = preparation
+        self.agents = preparation.agents
+        self.ballots = preparation.ballots
+        self.levels = preparation.levels
+        self.dependents = preparation.dependents
+
+    def reset(self, count_cycles=True):
+        """
+        Reset vector X and start with the ballots that can be calculated without any known vote.
+        Without count_cycles, the delegation graphs are not kept up to date.
+        """
+        self.X = {agent: None for agent in self.agents}
+        self.Voting.X = self.X
+        self.unresolved = len(self.agents)
+        # Running tally of the fixed votes
+        self.tally = {'0': 0, '1': 0}
+
+        # Preference levels of which the cycles are not counted yet
+        self.unobserved = list(self.levels) if count_cycles else []
+        self.graphs = self.preparation.graphs if count_cycles else None
+        for level in self.unobserved:
+            self.graphs[level].reset()
+
+        # Calculable ballots of unresolved agents per preference level
+        self.direct = {level: Candidates.of(self.preparation.direct[level]) for level in self.levels}
+        self.delegated = {level: Candidates.of(self.preparation.delegated[level]) for level in self.levels}
+        # Incremental state of the ballots, created when a vote in the ballot is fixed
+        self.trackers = {level: {} for level in self.levels}
+
+    def fix(self, agent, vote):
+        """
+        Fixes the vote of an agent and checks the ballots that depend on it again.
+        """
+        self.X[agent] = vote
+        self.unresolved -= 1
+        self.tally[vote] += 1
+
+        for level in self.levels:
+            self.direct[level].discard(agent)
+            self.delegated[level].discard(agent)
+
+        for level in self.unobserved:
+            self.graphs[level].remove(agent)
+
+        # A calculable ballot stays calculable with the same outcome, so it is not updated anymore
+        for dependent, level in self.dependents[agent]:
+            if self.X[dependent] is None and dependent not in self.delegated[level]:
+                tracker = self.trackers[level].get(dependent)
+                if tracker is None:
+                    tracker = self.trackers[level][dependent] = self.ballots[level][dependent].tracker()
+
+                boolean, outcome = tracker.assign(agent, vote)
+                if boolean:
+                    self.delegated[level].add(dependent, outcome)
+
+    def decided(self):
+        """
+        The majority of the fixed votes cannot change anymore when the votes of the
+        unresolved agents cannot make a difference.
+        return: the collective decision as majority computes it for the final vector X,
+                None when it still depends on the unresolved agents
+        """
+        number_of_agents = len(self.agents)
+        ones, zeros = self.tally['1'], self.tally['0']
+
+        if ones * 2 > number_of_agents:
+            return '1'
+        elif zeros * 2 > number_of_agents:
+            return '0'
+        elif (ones + self.unresolved) * 2 <= number_of_agents and (zeros + self.unresolved) * 2 <= number_of_agents:
+            return 'tie'
+
+        return None
+
+    def next_level(self):
+        """
+        return: the first preference level with a calculable ballot, None if there is none
+        """
+        for level in self.levels:
+            if self.direct[level] or self.delegated[level]:
+                return level
+
+        return None
+
+    def choice(self, *candidates):
+        """
+        Chooses a random agent from the union of the candidates.
+        return: list with the chosen agent and its vote
+        """
+        k = random.randrange(sum(len(c) for c in candidates))
+        for c in candidates:
+            if k < len(c):
+                b = c.agents[k]
+                return [(b, c.votes[b])]
+            k -= len(c)
+
+    def step(self, procedure, level):
+        """
+        Fixes the votes at a preference level according to the unravelling procedure.
+        """
+        direct, delegated = self.direct[level], self.delegated[level]
+
+        if procedure == 'U':
+            updates = direct.items() + delegated.items()
+        elif procedure == 'DU':
+            updates = direct.items() if direct else delegated.items()
+        elif procedure == 'RU':
+            updates = self.choice(direct, delegated)
+        elif procedure == 'DRU':
+            updates = self.choice(direct) if direct else self.choice(delegated)
+        else:
+            raise ValueError(f"Unknown unravelling procedure '{procedure}'")
+
+        # All updates are calculated before any of them is fixed
+        for agent, vote in updates:
+            self.fix(agent, vote)
+
+    def observe(self, level, cycles):
+        """
+        Adds the cycles of a preference level to the cycle counter ‘cycles’. A resolved
+        agent only removes edges, so the cycles at a later visit of the same preference
+        level are a subset of the cycles at the first visit.
+        """
+        graph = self.graphs[level]
+        if cycles.metric == 'scc':
+            cycles.add_components(level, graph.components.values)
+        elif cycles.bounded():
+            cycles.add(level, graph.cycles(cycles.max_length))
+        else:
+            # Without a bound only the number of cycles matters, which the graph keeps per component
+            cycles.add_count(level, lambda: graph.count_cycles(cycles.max_length))
+        self.unobserved.remove(level)
+
+    def unravel(self, procedure, cycles, stats=None, decision_only=False):
+        """
+        Unravels the profile with an unravelling procedure and adds the cycles
+        that occur at each visited preference level to the cycle counter ‘cycles’,
+        or counts no cycles when cycles is None.
+        stats: counter of the procedure that counts the rounds and the preference
+               levels that are checked, None to count nothing
+        decision_only: stop as soon as the collective decision is known, see decided
+        return: the final vector X, in which agents are unresolved when stopped early
+        """
+        self.reset(cycles is not None)
+        self.stopped_early = False
+
+        while self.unresolved:
+            level = self.next_level()
+            if level is None:
+                break
+
+            if stats is not None:
+                stats['iterations'] += 1
+                stats['levels'] += self.levels.index(level) + 1
+
+            # Preference levels before the updated level are visited unchanged
+            if cycles is not None:
+                for j in [j for j in self.unobserved if j < level]:
+                    self.observe(j, cycles)
+
+            self.step(procedure, level)
+            if cycles is not None and level in self.unobserved:
+                self.observe(level, cycles)
+
+            if decision_only and self.unresolved and self.decided() is not None:
+                self.stopped_early = self.next_level() is not None
+                break
+
+        return self.X